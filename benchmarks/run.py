@@ -0,0 +1,298 @@
+"""
+Benchmarks of the input, build and serialize hot paths on synthetic Singer streams
+
+Usage:
+    python benchmarks/run.py [--sizes 10000 100000] [--cases ...] [--repeat 3]
+                             [--threshold 0.2] [--no-memory] [--update-baseline]
+
+Every case is run repeat times for its best throughput and once under tracemalloc
+for its peak memory. Results are compared with benchmarks/baseline.json and the run fails when
+a case is slower, or uses more memory, than its baseline by more than threshold.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from target_intacct import payroll_journal, statistical_journal  # noqa: E402
+from target_intacct.dry_run import DryRunSDK  # noqa: E402
+from target_intacct.payment_record import build_payment_functions  # noqa: E402
+from target_intacct.utils import get_input, set_journal_entry_value  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+DEFAULT_SIZES = [10000, 100000]
+
+DEFAULT_THRESHOLD = 0.2
+
+ACCOUNTS = [str(number) for number in range(1000, 1100)]
+DEPARTMENTS = [f"D{number}" for number in range(20)]
+LOCATIONS = [f"L{number}" for number in range(20)]
+CLASSES = [f"C{number}" for number in range(20)]
+
+PAYMENT_CONFIG = {
+    "accountno_1": 1000,
+    "accountno_2": 1001,
+    "accountno_3": 1002,
+    "bankaccountid": "BANK",
+    "checkno": "1",
+    "classid": "C1",
+    "customerid": "CUST",
+    "departmentid": "D1",
+    "description": "Payout",
+    "item1099": "false",
+    "locationid": "L1",
+    "manual_payment_memo": "Negative payout",
+    "memo": "Payout",
+    "paymentmethod": "EFT",
+    "projectid": "P1",
+    "source": "Store",
+    "vendorid": "V1",
+}
+
+
+def statistical_frame(size):
+    rows = np.arange(size)
+    return pd.DataFrame(
+        {
+            "tr_type": np.where(rows % 2, "1", "-1").astype(object),
+            "accountno_1": np.array(ACCOUNTS, dtype=object)[rows % len(ACCOUNTS)],
+            "amount_1": rows * 0.25,
+            "accountno_2": np.array(ACCOUNTS, dtype=object)[(rows + 7) % len(ACCOUNTS)],
+            "amount_2": rows * 1.5,
+            "departmentid": np.array(DEPARTMENTS, dtype=object)[rows % len(DEPARTMENTS)],
+            "locationid": np.array(LOCATIONS, dtype=object)[rows % len(LOCATIONS)],
+        }
+    )
+
+
+def payroll_frame(size):
+    rows = np.arange(size)
+    return pd.DataFrame(
+        {
+            "AccountNumber": np.array(ACCOUNTS, dtype=object)[rows % len(ACCOUNTS)],
+            "BusinessUnit": np.array(CLASSES, dtype=object)[rows % len(CLASSES)],
+            "locationid": np.array(LOCATIONS, dtype=object)[rows % len(LOCATIONS)],
+            "PracticeAreaID": np.array(DEPARTMENTS, dtype=object)[rows % len(DEPARTMENTS)],
+            "Currency": "USD",
+            "Description": "Payroll",
+            "amount": rows * 0.75,
+            "TR_TYPE": np.where(rows % 2, "Debit", "Credit").astype(object),
+            "ExchangeRate": "Intacct Daily Rate",
+            "Transaction Date": "01/31/2024",
+            "Journal": "PYRJ",
+        }
+    )
+
+
+def payment_frame(size):
+    rows = np.arange(size)
+    days = [date(2024, 1, 1) + timedelta(days=int(day)) for day in rows % 365]
+    return pd.DataFrame(
+        {
+            "payout_id": rows,
+            "payout_amount": np.where(rows % 10, rows * 1.5, -rows * 0.5),
+            "gross_amount": rows * 2.0,
+            "total_fees": np.where(rows % 3, rows * 0.1, 0.0),
+            "total_sales_tax": np.where(rows % 4, rows * 0.05, 0.0),
+            "year": [day.year for day in days],
+            "month": [day.month for day in days],
+            "day": [day.day for day in days],
+        }
+    )
+
+
+def singer_lines(size):
+    schema = {
+        "properties": {
+            "amount_1": {"type": ["number", "null"]},
+            "amount_2": {"type": ["number", "null"]},
+        }
+    }
+    lines = [json.dumps({"type": "SCHEMA", "stream": "journal", "schema": schema, "key_properties": []})]
+    for record in statistical_frame(size).to_dict("records"):
+        lines.append(json.dumps({"type": "RECORD", "stream": "journal", "record": record}))
+    return lines
+
+
+def dry_run_client():
+    return DryRunSDK(
+        reference_snapshot={},
+        api_url="https://localhost",
+        company_id="benchmark",
+        sender_id="benchmark",
+        sender_password="",
+        user_id="benchmark",
+        user_password="",
+        headers={},
+        entity_id="",
+    )
+
+
+# Each case prepares its input outside the measurement and returns the function to measure
+def case_get_input(size):
+    lines = singer_lines(size)
+    return lambda: get_input(lines)
+
+
+def case_set_journal_entry_value(size):
+    accounts = frozenset(ACCOUNTS)
+    values = [ACCOUNTS[row % len(ACCOUNTS)] for row in range(size)]
+
+    def run():
+        for value in values:
+            set_journal_entry_value({}, accounts, "ACCOUNTNO", value, "benchmark")
+
+    return run
+
+
+def case_statistical_build_lines(size):
+    data = statistical_frame(size)
+    dimension_values = {"departmentid": frozenset(DEPARTMENTS), "locationid": frozenset(LOCATIONS)}
+    return lambda: statistical_journal.build_lines(
+        data, dimension_values, frozenset(ACCOUNTS), "statistical_journal", "benchmark"
+    )
+
+
+def case_payroll_build_lines(size):
+    data = payroll_frame(size)
+    return lambda: payroll_journal.build_lines(
+        data,
+        frozenset(ACCOUNTS),
+        frozenset(CLASSES),
+        frozenset(LOCATIONS),
+        frozenset(DEPARTMENTS),
+        "payroll_journal",
+    )
+
+
+def case_payment_record_functions(size):
+    data = payment_frame(size)
+    return lambda: build_payment_functions(data, PAYMENT_CONFIG)
+
+
+def case_serialize_journal(size):
+    client = dry_run_client()
+    journal = statistical_journal.build_lines(
+        statistical_frame(size // 2),
+        {"departmentid": frozenset(DEPARTMENTS), "locationid": frozenset(LOCATIONS)},
+        frozenset(ACCOUNTS),
+        "statistical_journal",
+        "benchmark",
+    )[0]
+    return lambda: client.format_and_send_request(
+        {"create": {"object": "GLBATCH", "GLBATCH": journal}}, True
+    )
+
+
+CASES = {
+    "get_input": case_get_input,
+    "set_journal_entry_value": case_set_journal_entry_value,
+    "statistical_build_lines": case_statistical_build_lines,
+    "payroll_build_lines": case_payroll_build_lines,
+    "payment_record_functions": case_payment_record_functions,
+    "serialize_journal": case_serialize_journal,
+}
+
+
+def measure(case, size, repeat=3, memory=True):
+    """Return the best records per second of repeat runs and the peak bytes of a case."""
+    run = CASES[case](size)
+    seconds = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        run()
+        seconds = min(seconds, time.perf_counter() - started_at)
+    result = {"seconds": round(seconds, 4), "records_per_second": round(size / seconds, 1)}
+
+    if memory:
+        run = CASES[case](size)
+        tracemalloc.start()
+        try:
+            run()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def regressions(results, baseline, threshold):
+    """List the cases slower, or using more memory, than their baseline past threshold."""
+    failures = []
+    for case, sizes in results.items():
+        for size, result in sizes.items():
+            expected = baseline.get(case, {}).get(size)
+            if not expected:
+                continue
+            if result["records_per_second"] < expected["records_per_second"] * (1 - threshold):
+                failures.append(
+                    f"{case} at {size} records: {result['records_per_second']} records/s, "
+                    f"baseline {expected['records_per_second']}"
+                )
+            if "peak_bytes" in result and "peak_bytes" in expected:
+                if result["peak_bytes"] > expected["peak_bytes"] * (1 + threshold):
+                    failures.append(
+                        f"{case} at {size} records: peak {result['peak_bytes']} bytes, "
+                        f"baseline {expected['peak_bytes']}"
+                    )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed share of throughput lost or memory added against the baseline",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case, the fastest one is kept")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory measurement")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the baseline")
+    args = parser.parse_args()
+
+    # The hot paths log progress, metrics and slow requests, keep the output to the results
+    logging.disable(logging.WARNING)
+
+    results = {}
+    for case in args.cases:
+        for size in args.sizes:
+            result = measure(case, size, repeat=max(1, args.repeat), memory=not args.no_memory)
+            results.setdefault(case, {})[str(size)] = result
+            peak = f", peak {result['peak_bytes'] / 2 ** 20:.1f}MB" if "peak_bytes" in result else ""
+            print(f"{case:<26} {size:>9} records  {result['records_per_second']:>12} records/s{peak}", flush=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    if args.update_baseline:
+        for case, sizes in results.items():
+            baseline.setdefault(case, {}).update(sizes)
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    failures = regressions(results, baseline, args.threshold)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,40 @@
 import singer
 
 
-from .client import get_client
-from .const import DEFAULT_API_URL, REQUIRED_CONFIG_KEYS
+from .cache import ReferenceCache, SessionCache
+from .client import get_client, get_transport
+from .const import (
+    DEFAULT_API_URL,
+    DEFAULT_FULL_DOWNLOAD_RATIO,
+    DEFAULT_HTTP_CONNECT_TIMEOUT,
+    DEFAULT_HTTP_POOL_SIZE,
+    DEFAULT_HTTP_READ_TIMEOUT,
+    DEFAULT_JOURNAL_MAX_BYTES,
+    DEFAULT_JOURNAL_MAX_LINES,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_PAGE_FETCH_WORKERS,
+    DEFAULT_POST_WORKERS,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_RATE_LIMIT_INCREASE,
+    DEFAULT_RATE_LIMIT_MIN,
+    DEFAULT_REFERENCE_CACHE_MAX_BYTES,
+    DEFAULT_REFERENCE_CACHE_TTL,
+    DEFAULT_RETRY_BACKOFF_BASE,
+    DEFAULT_RETRY_BACKOFF_MAX,
+    DEFAULT_SLOW_REQUEST_SECONDS,
+    DEFAULT_SLOW_RESPONSE_SECONDS,
+    DEFAULT_WRITE_BATCH_MAX_BYTES,
+    DEFAULT_WRITE_BATCH_SIZE,
+    REQUIRED_CONFIG_KEYS,
+)
 from .statistical_journal import statistical_journal_upload
 from .payroll_journal import journal_upload
 from .employee_rate import employee_rate_upload
 from .payment_record import payment_record_upload
+from .dry_run import DryRunSDK, load_reference_snapshot
+from .ledger import PostingLedger
+from .ratelimit import get_rate_limiter
+from .timing import request_metrics, timings, write_metrics
 
 logger = singer.get_logger()
 
@@ -20,8 +48,36 @@ def main() -> None:
     args = singer.utils.parse_args(REQUIRED_CONFIG_KEYS)
     config = args.config
 
-    # Login
-    intacct_client = get_client(
+    # Optional on-disk cache of the reference data used for input verification
+    reference_cache = None
+    if config.get("reference_cache_dir"):
+        reference_cache = ReferenceCache(
+            cache_dir=config["reference_cache_dir"],
+            ttl=float(config.get("reference_cache_ttl", DEFAULT_REFERENCE_CACHE_TTL)),
+            max_bytes=int(config.get("reference_cache_max_bytes", DEFAULT_REFERENCE_CACHE_MAX_BYTES)),
+        )
+
+    # Optional on-disk cache of the API session, so short runs can skip logging in
+    session_cache = SessionCache(config["session_cache_path"]) if config.get("session_cache_path") else None
+
+    # Optional ledger of the posted records, so a failed run can be resumed
+    ledger = PostingLedger(config["ledger_path"]) if config.get("ledger_path") else None
+
+    # Requests per second allowed for the company, adjusted when Intacct throttles or slows down
+    rate_limit = float(config.get("rate_limit", DEFAULT_RATE_LIMIT))
+    rate_limiter = get_rate_limiter(
+        config["company_id"],
+        rate=rate_limit,
+        min_rate=float(config.get("rate_limit_min", DEFAULT_RATE_LIMIT_MIN)),
+        max_rate=float(config.get("rate_limit_max", rate_limit)),
+        increase=float(config.get("rate_limit_increase", DEFAULT_RATE_LIMIT_INCREASE)),
+        slow_response_seconds=float(config.get("slow_response_seconds", DEFAULT_SLOW_RESPONSE_SECONDS)),
+    )
+
+    # Requests taking longer are logged with their control id and kept in the metrics
+    request_metrics.slow_seconds = float(config.get("slow_request_seconds", DEFAULT_SLOW_REQUEST_SECONDS))
+
+    client_kwargs = dict(
         api_url=config.get("api_url", DEFAULT_API_URL),
         company_id=config["company_id"],
         sender_id=config["sender_id"],
@@ -30,8 +86,44 @@ def main() -> None:
         user_password=config["user_password"],
         headers={"User-Agent": config["user_agent"]} if "user_agent" in config else {},
         entity_id=config["entity_id"] if "entity_id" in config else "",
+        page_fetch_workers=config.get("page_fetch_workers", DEFAULT_PAGE_FETCH_WORKERS),
+        full_download_ratio=float(config.get("full_download_ratio", DEFAULT_FULL_DOWNLOAD_RATIO)),
+        journal_max_lines=int(config.get("journal_max_lines", DEFAULT_JOURNAL_MAX_LINES)),
+        journal_max_bytes=int(config.get("journal_max_bytes", DEFAULT_JOURNAL_MAX_BYTES)),
+        journal_rollback=bool(config.get("journal_rollback", False)),
+        ledger=ledger,
+        reference_cache=reference_cache,
+        session_cache=session_cache,
+        transport=get_transport(int(config.get("http_pool_size", DEFAULT_HTTP_POOL_SIZE))),
+        connect_timeout=float(config.get("http_connect_timeout", DEFAULT_HTTP_CONNECT_TIMEOUT)),
+        read_timeout=float(config.get("http_read_timeout", DEFAULT_HTTP_READ_TIMEOUT)),
+        write_batch_size=int(config.get("write_batch_size", DEFAULT_WRITE_BATCH_SIZE)),
+        write_batch_max_bytes=int(config.get("write_batch_max_bytes", DEFAULT_WRITE_BATCH_MAX_BYTES)),
+        post_workers=int(config.get("post_workers", DEFAULT_POST_WORKERS)),
+        max_in_flight=config.get("max_in_flight"),
+        rate_limiter=rate_limiter,
+        max_retries=int(config.get("max_retries", DEFAULT_MAX_RETRIES)),
+        retry_backoff_base=float(config.get("retry_backoff_base", DEFAULT_RETRY_BACKOFF_BASE)),
+        retry_backoff_max=float(config.get("retry_backoff_max", DEFAULT_RETRY_BACKOFF_MAX)),
     )
 
+    dry_run_output = None
+    if config.get("dry_run"):
+        # Run the whole pipeline offline, validating against a reference snapshot
+        if not config.get("reference_snapshot"):
+            raise Exception("dry_run requires a reference_snapshot file")
+        if config.get("dry_run_output"):
+            dry_run_output = open(config["dry_run_output"], "wb")
+        client_kwargs.update(sender_password="", user_password="")
+        intacct_client = DryRunSDK(
+            reference_snapshot=load_reference_snapshot(config["reference_snapshot"]),
+            output=dry_run_output,
+            **client_kwargs,
+        )
+    else:
+        # Login
+        intacct_client = get_client(**client_kwargs)
+
     object_name = config["object_name"]
 
     # If there is no Batch Title specified for journal entries, use the object_name as the batch_title
@@ -40,16 +132,26 @@ def main() -> None:
     except KeyError:
         batch_title = object_name
 
-    if object_name == "payroll_journal":
-        journal_upload(intacct_client, object_name, batch_title)
-    elif object_name == "statistical_journal":
-        statistical_journal_upload(intacct_client, object_name, batch_title)
-    elif object_name == "employee_rate":
-        employee_rate_upload(intacct_client)
-    elif object_name == "payment_record":
-        payment_record_upload(intacct_client, config)
-    else:
-        raise Exception("Valid Object Name Not Found")
+    try:
+        if object_name == "payroll_journal":
+            journal_upload(intacct_client, object_name, batch_title)
+        elif object_name == "statistical_journal":
+            statistical_journal_upload(intacct_client, object_name, batch_title)
+        elif object_name == "employee_rate":
+            employee_rate_upload(intacct_client)
+        elif object_name == "payment_record":
+            payment_record_upload(intacct_client, config)
+        else:
+            raise Exception("Valid Object Name Not Found")
+    finally:
+        timings.log()
+        request_metrics.log()
+        if config.get("metrics_path"):
+            write_metrics(config["metrics_path"])
+        if isinstance(intacct_client, DryRunSDK):
+            intacct_client.log_summary()
+        if dry_run_output is not None:
+            dry_run_output.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+"""
+Columnar buffering of input records typed by their Singer SCHEMA
+"""
+from array import array
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from .const import ARITHMETIC_INPUT_COLUMNS
+
+# array typecode, numpy dtype and converter of the numeric JSON schema types
+NUMERIC_COLUMN_TYPES = {
+    "integer": ("q", np.int64, int),
+    "number": ("d", np.float64, float),
+}
+
+
+def column_type(property_schema: Dict) -> Optional[str]:
+    """Return "integer" or "number" if a schema property only holds that type, otherwise None."""
+    types = property_schema.get("type", [])
+    if isinstance(types, str):
+        types = [types]
+    types = set(types) - {"null"}
+    if types == {"integer"}:
+        return "integer"
+    if types and types <= {"integer", "number"}:
+        return "number"
+    return None
+
+
+def is_arithmetic_column(name: str) -> bool:
+    """Whether an input column holds amounts or date parts, rather than ids kept as given."""
+    return name.startswith("amount") or name in ARITHMETIC_INPUT_COLUMNS
+
+
+class Column:
+    """Values of one column, stored in a typed array when the schema declares a numeric type."""
+
+    def __init__(self, type_name: Optional[str] = None):
+        self.type_name = type_name
+        if type_name is None:
+            self.values: Union[array, List] = []
+            self._convert: Optional[Callable] = None
+        else:
+            typecode, _, self._convert = NUMERIC_COLUMN_TYPES[type_name]
+            self.values = array(typecode)
+
+    def append(self, value) -> None:
+        if self._convert is None:
+            self.values.append(value)
+            return
+        try:
+            self.values.append(self._convert(value))
+        except (TypeError, ValueError, OverflowError):
+            # The value does not match the schema, keep the column as python objects
+            self.values = list(self.values)
+            self._convert = None
+            self.type_name = None
+            self.values.append(value)
+
+    def to_numpy(self) -> Union[np.ndarray, List]:
+        """Numeric columns as numpy arrays sharing the buffer's memory, others as lists."""
+        if self.type_name is None:
+            return self.values
+        return np.frombuffer(self.values, dtype=NUMERIC_COLUMN_TYPES[self.type_name][1])
+
+
+class ColumnarBuffer:
+    """Accumulates the records of one stream column by column.
+
+    Converters are compiled once per column from the stream's SCHEMA message, so
+    numeric values are converted as they are read and stored in typed arrays
+    instead of one python object per value. Only amount and date part columns are
+    typed; other columns, such as number typed ids, keep the values of the records.
+    """
+
+    def __init__(self, stream: str, schema: Optional[Dict] = None):
+        self.stream = stream
+        self.columns: Dict[str, Column] = {}
+        self._column_types = {
+            name: column_type(property_schema)
+            for name, property_schema in (schema or {}).get("properties", {}).items()
+            if is_arithmetic_column(name)
+        }
+
+    def append(self, record: Dict) -> None:
+        columns = self.columns
+        for key, value in record.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = Column(self._column_types.get(key))
+            column.append(value)
+
+    def to_dict(self) -> Dict:
+        """Return the columns keyed by name, with the stream name under "stream"."""
+        columns = {key: column.to_numpy() for key, column in self.columns.items()}
+        columns["stream"] = self.stream
+        return columns
@@ -0,0 +1,167 @@
+"""
+On-disk caches of Intacct reference data and API sessions shared between runs
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import singer
+
+logger = singer.get_logger()
+
+
+class ReferenceCache:
+    """Caches the objects returned by get_entity on disk.
+
+    Entries are keyed by company id, entity id, object type and selected fields and are
+    stored as pickled rows of field values, which load far faster than re-downloading
+    or parsing JSON. Entries older than ttl seconds are ignored, and the least recently
+    used entries are evicted when the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, ttl: float, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, company_id: str, entity_id: str, object_type: str, fields: List[str]) -> str:
+        key = json.dumps([company_id, entity_id or "", object_type, list(fields)])
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{object_type}-{digest[:32]}.pickle")
+
+    def get(
+        self, company_id: str, entity_id: str, object_type: str, fields: List[str]
+    ) -> Optional[List[Dict]]:
+        """Return the cached objects, or None if they are missing or expired."""
+        path = self._path(company_id, entity_id, object_type, fields)
+        try:
+            with open(path, "rb") as cache_file:
+                entry = pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            logger.warning(f"Ignoring unreadable reference cache entry {path}")
+            return None
+
+        if entry["fields"] != list(fields) or time.time() - entry["created_at"] > self.ttl:
+            return None
+
+        # Mark the entry as recently used for eviction
+        os.utime(path)
+        return [dict(zip(entry["fields"], row)) for row in entry["rows"]]
+
+    def set(
+        self,
+        company_id: str,
+        entity_id: str,
+        object_type: str,
+        fields: List[str],
+        intacct_objects: List[Dict],
+    ) -> None:
+        """Store the objects of an object type and evict old entries if needed."""
+        fields = list(fields)
+        entry = {
+            "created_at": time.time(),
+            "fields": fields,
+            "rows": [tuple(o.get(field) for field in fields) for o in intacct_objects],
+        }
+        path = self._path(company_id, entity_id, object_type, fields)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as cache_file:
+                pickle.dump(entry, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except OSError:
+            logger.warning(f"Unable to write reference cache entry {path}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        self._evict()
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pickle"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+
+class SessionCache:
+    """Stores Intacct API sessions on disk so short runs can skip the login request.
+
+    Sessions are keyed by a hash of the API url, sender, company, user and entity,
+    and only the session id, endpoint and expiry are written. The file is readable
+    by the current user only.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def _key(api_url: str, sender_id: str, company_id: str, user_id: str, entity_id: str) -> str:
+        key = json.dumps([api_url, sender_id, company_id, user_id, entity_id or ""])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as session_file:
+                return json.load(session_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable session cache {self.path}")
+            return {}
+
+    def get(self, *key_parts: str) -> Optional[Dict]:
+        """Return the cached session (sessionid, endpoint, expires_at) if it has not expired."""
+        session = self._read().get(self._key(*key_parts))
+        if session and session["expires_at"] > time.time():
+            return session
+        return None
+
+    def set(self, *key_parts: str, session_id: str, endpoint: str, expires_at: float) -> None:
+        """Store a session, dropping any expired ones."""
+        now = time.time()
+        sessions = {
+            key: session for key, session in self._read().items() if session["expires_at"] > now
+        }
+        sessions[self._key(*key_parts)] = {
+            "sessionid": session_id,
+            "endpoint": endpoint,
+            "expires_at": expires_at,
+        }
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            # mkstemp creates the file readable and writable by the owner only
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as session_file:
+                json.dump(sessions, session_file)
+            os.replace(temp_path, self.path)
+        except OSError:
+            logger.warning(f"Unable to write session cache {self.path}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
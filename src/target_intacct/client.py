@@ -2,30 +2,90 @@
 API Base class with util functions
 """
 import datetime as dt
+import hashlib
+import itertools
 import json
+import math
+import random
 import re
+import threading
+import time
 import uuid
-from typing import Dict, List, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 from urllib.parse import unquote
+from xml.parsers.expat import ExpatError
 
 import requests
 import xmltodict
+from requests.adapters import HTTPAdapter
 
 import singer
+from singer.metrics import Point
 
 from target_intacct.exceptions import (
+    DuplicateControlIdError,
     ExpiredTokenError,
     InternalServerError,
     InvalidTokenError,
     NoPrivilegeError,
     NotFoundItemError,
     SageIntacctSDKError,
+    ThrottledError,
     WrongParamsError,
 )
 
-from .const import INTACCT_OBJECTS
+from .cache import ReferenceCache, SessionCache
+from .const import (
+    DEFAULT_FULL_DOWNLOAD_RATIO,
+    DEFAULT_HTTP_CONNECT_TIMEOUT,
+    DEFAULT_HTTP_POOL_SIZE,
+    DEFAULT_HTTP_READ_TIMEOUT,
+    DEFAULT_JOURNAL_MAX_BYTES,
+    DEFAULT_JOURNAL_MAX_LINES,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_PAGE_FETCH_WORKERS,
+    DEFAULT_POST_WORKERS,
+    DEFAULT_RETRY_BACKOFF_BASE,
+    DEFAULT_RETRY_BACKOFF_MAX,
+    DEFAULT_SESSION_TIMEOUT,
+    DEFAULT_WRITE_BATCH_MAX_BYTES,
+    DEFAULT_WRITE_BATCH_SIZE,
+    DUPLICATE_CONTROL_ID_ERRORS,
+    EXISTENCE_QUERIES_PER_REQUEST,
+    EXISTENCE_QUERY_CHUNK_SIZE,
+    INTACCT_OBJECTS,
+    RESPONSE_CHUNK_SIZE,
+    THROTTLED_STATUS_CODES,
+)
+from .ledger import PostingLedger, record_keys
+from .posting import post_concurrently
+from .ratelimit import RateLimiter, get_rate_limiter
+from .reference import normalize_key
+from .request_xml import to_xml
+from .response_stream import EntityPage, EntityPageParser
+from .timing import RequestRecord, request_metrics, timings
 logger = singer.get_logger()
 
+# Failures that do not depend on the request and may succeed when it is sent again
+RETRYABLE_ERRORS = (
+    InternalServerError,
+    ThrottledError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+)
+
+
+def get_transport(pool_size: int = DEFAULT_HTTP_POOL_SIZE) -> requests.Session:
+    """Returns a requests Session keeping up to pool_size connections alive per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 class SageIntacctSDK:
     """The base class for all API classes."""
 
@@ -39,7 +99,27 @@ class SageIntacctSDK:
         user_password: str,
         headers: Dict,
         entity_id: str,
+        page_fetch_workers: int = DEFAULT_PAGE_FETCH_WORKERS,
+        reference_cache: Optional[ReferenceCache] = None,
+        session_cache: Optional[SessionCache] = None,
+        transport: Optional[requests.Session] = None,
+        connect_timeout: float = DEFAULT_HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_HTTP_READ_TIMEOUT,
+        write_batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+        write_batch_max_bytes: int = DEFAULT_WRITE_BATCH_MAX_BYTES,
+        post_workers: int = DEFAULT_POST_WORKERS,
+        max_in_flight: Optional[int] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_backoff_base: float = DEFAULT_RETRY_BACKOFF_BASE,
+        retry_backoff_max: float = DEFAULT_RETRY_BACKOFF_MAX,
+        full_download_ratio: float = DEFAULT_FULL_DOWNLOAD_RATIO,
+        journal_max_lines: int = DEFAULT_JOURNAL_MAX_LINES,
+        journal_max_bytes: int = DEFAULT_JOURNAL_MAX_BYTES,
+        journal_rollback: bool = False,
+        ledger: Optional[PostingLedger] = None,
     ):
+        self.__login_url = api_url
         self.__api_url = api_url
         self.__company_id = company_id
         self.__sender_id = sender_id
@@ -48,6 +128,27 @@ class SageIntacctSDK:
         self.__user_password = user_password
         self.__headers = headers
         self.entity_id = entity_id
+        self.page_fetch_workers = max(1, int(page_fetch_workers))
+        self.reference_cache = reference_cache
+        self.session_cache = session_cache
+        self.__transport = transport if transport is not None else get_transport()
+        self.__timeout = (connect_timeout, read_timeout)
+        self.write_batch_size = max(1, int(write_batch_size))
+        self.write_batch_max_bytes = int(write_batch_max_bytes)
+        self.post_workers = max(1, int(post_workers))
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter(company_id)
+        self.max_retries = max(0, int(max_retries))
+        self.retry_backoff_base = retry_backoff_base
+        self.retry_backoff_max = retry_backoff_max
+        self.full_download_ratio = full_download_ratio
+        self.journal_max_lines = max(1, int(journal_max_lines))
+        self.journal_max_bytes = int(journal_max_bytes)
+        self.journal_rollback = journal_rollback
+        self.ledger = ledger
+        self.retry_count = 0
+        self.backoff_seconds = 0.0
+        self.__session_lock = threading.Lock()
 
         """Initialize connection to Sage Intacct.
 
@@ -56,7 +157,36 @@ class SageIntacctSDK:
         :param user_id: Sage Intacct user id
         :param company_id: Sage Intacct company id
         :param user_password: Sage Intacct user password
+        :param page_fetch_workers: Number of query pages fetched concurrently
+        :param reference_cache: Optional on-disk cache for get_entity and get_entities
+        :param session_cache: Optional on-disk cache of the API session between runs
+        :param transport: Object with a requests compatible post method, a pooled Session by default
+        :param connect_timeout: Seconds to wait for a connection to Sage Intacct
+        :param read_timeout: Seconds to wait for a Sage Intacct response
+        :param write_batch_size: Maximum number of functions sent in one request by post_batch
+        :param write_batch_max_bytes: Maximum serialized size of the functions in one post_batch request
+        :param post_workers: Number of post_batch requests sent concurrently
+        :param max_in_flight: Maximum number of post_batch requests queued ahead, twice post_workers by default
+        :param rate_limiter: Limiter shared by every request, the company's limiter by default
+        :param max_retries: Number of times a request failing with a transient error is sent again
+        :param retry_backoff_base: Seconds of backoff before the first retry, doubled for every retry
+        :param retry_backoff_max: Maximum seconds of backoff before a retry
+        :param full_download_ratio: Share of an object type's count above which get_existing_values
+            downloads every object instead of querying the input values
+        :param journal_max_lines: Maximum number of lines in one GLBATCH posted by post_journals
+        :param journal_max_bytes: Maximum serialized size of the lines of one GLBATCH posted by post_journals
+        :param journal_rollback: Delete the batches post_journals posted when another batch failed
+        :param ledger: Optional record of the functions post_batch posted, to resume interrupted runs
         """
+        # Reuse the session of a previous run while it is valid
+        if self.session_cache:
+            session = self.session_cache.get(*self._session_cache_key())
+            if session:
+                logger.info("Reusing cached Intacct API session")
+                self.__api_url = session["endpoint"]
+                self.__session_id = session["sessionid"]
+                return
+
         # Initializing variables
         self._set_session_id(
             user_id=self.__user_id,
@@ -71,6 +201,7 @@ class SageIntacctSDK:
         """Sets the session id for APIs."""
 
         timestamp = dt.datetime.now()
+        control_id = str(uuid.uuid4())
         dict_body = {
             "request": {
                 "control": {
@@ -92,7 +223,7 @@ class SageIntacctSDK:
                     },
                     "content": {
                         "function": {
-                            "@controlid": str(uuid.uuid4()),
+                            "@controlid": control_id,
                             "getAPISession": None,
                         }
                     },
@@ -100,49 +231,220 @@ class SageIntacctSDK:
             }
         }
 
-        response = self._post_request(dict_body, self.__api_url)
+        with timings.stage("login"), request_metrics.request("login", control_id, 1) as request:
+            response = self._post_request(dict_body, self.__api_url, request)
 
         if response["authentication"]["status"] == "success":
             session_details = response["result"]["data"]["api"]
             self.__api_url = session_details["endpoint"]
             self.__session_id = session_details["sessionid"]
 
+            if self.session_cache:
+                self.session_cache.set(
+                    *self._session_cache_key(),
+                    session_id=self.__session_id,
+                    endpoint=self.__api_url,
+                    expires_at=self._session_expiry(response["authentication"]),
+                )
+
         else:
             raise SageIntacctSDKError("Error: {0}".format(response["errormessage"]))
 
-    @singer.utils.ratelimit(10, 1)
-    def _post_request(self, dict_body: dict, api_url: str) -> Dict:
+    def _session_cache_key(self) -> List[str]:
+        return [self.__login_url, self.__sender_id, self.__company_id, self.__user_id, self.entity_id]
+
+    @staticmethod
+    def _session_expiry(authentication: Dict) -> float:
+        """Timestamp at which a new session expires, with a minute of margin."""
+        try:
+            expires_at = dt.datetime.fromisoformat(authentication["sessiontimeout"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            expires_at = dt.datetime.now().timestamp() + DEFAULT_SESSION_TIMEOUT
+        return expires_at - 60
+
+    def _renew_session(self, expired_session_id: str) -> None:
+        """Logs in again, unless another thread already replaced the expired session."""
+        with self.__session_lock:
+            if self.__session_id != expired_session_id:
+                return
+            logger.info("Intacct API session expired or is invalid, logging in again")
+            self._set_session_id(
+                user_id=self.__user_id,
+                company_id=self.__company_id,
+                user_password=self.__user_password,
+                entity_id=self.entity_id,
+            )
+
+    def _post_session_request(
+        self,
+        functions: Union[List[Dict], Dict],
+        endpoint: str,
+        control_id: Optional[str] = None,
+        page_parser: Optional[EntityPageParser] = None,
+        function_results: bool = False,
+    ) -> Union[Dict, EntityPage]:
+        """Post functions with the current session, logging in again and retrying once if it expired.
+
+        A control_id marks the request as unique, so Intacct refuses to run it twice. With
+        function_results the operation is returned with the result of every function,
+        which the caller checks, even when the request holds a single function.
+        """
+        # Requests are reported under the control id of their first function
+        first_function = functions[0] if isinstance(functions, list) else functions
+        function_count = len(functions) if isinstance(functions, list) else 1
+
+        session_id = self.__session_id
+        try:
+            with singer.metrics.http_request_timer(endpoint=endpoint), request_metrics.request(
+                endpoint, first_function["@controlid"], function_count
+            ) as request:
+                return self._post_request(
+                    self._session_request_body(functions, control_id),
+                    self.__api_url,
+                    request,
+                    page_parser,
+                    function_results,
+                )
+        except (ExpiredTokenError, InvalidTokenError):
+            self._renew_session(session_id)
+
+        with singer.metrics.http_request_timer(endpoint=endpoint), request_metrics.request(
+            endpoint, first_function["@controlid"], function_count
+        ) as request:
+            return self._post_request(
+                self._session_request_body(functions, control_id),
+                self.__api_url,
+                request,
+                page_parser,
+                function_results,
+            )
+
+    def _post_request(
+        self,
+        dict_body: dict,
+        api_url: str,
+        request: RequestRecord,
+        page_parser: Optional[EntityPageParser] = None,
+        function_results: bool = False,
+    ) -> Union[Dict, EntityPage]:
         """Create a HTTP post request.
 
         Parameters:
             dict_body (dict): HTTP POST body data for the wanted API.
             api_url (str): Url for the wanted API.
+            request (RequestRecord): Collects the phase timings and byte counts of the request.
+            page_parser (EntityPageParser): Streams a successful query page into rows.
+            function_results (bool): Return the function results unchecked, for the caller to check.
 
         Returns:
-            A response from the request (dict).
+            A response from the request (dict), or the page parsed by page_parser.
         """
 
-        api_headers = {"content-type": "application/xml"}
+        started_at = time.perf_counter()
+        body = to_xml(dict_body).encode("utf-8")
+        request.add_phase("serialize", time.perf_counter() - started_at)
+
+        attempt = 0
+        while True:
+            try:
+                return self._send_request(body, api_url, dict_body, request, page_parser, function_results)
+            except RETRYABLE_ERRORS as exc:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                # Exponential backoff with full jitter
+                delay = random.uniform(
+                    0, min(self.retry_backoff_max, self.retry_backoff_base * 2 ** (attempt - 1))
+                )
+                logger.warning(
+                    f"Request failed with {type(exc).__name__}, retrying in {delay:.2f}s "
+                    f"(attempt {attempt} of {self.max_retries})"
+                )
+                self.retry_count += 1
+                self.backoff_seconds += delay
+                tags = {"error": type(exc).__name__}
+                singer.metrics.log(logger, Point("counter", "http_request_retries", 1, tags))
+                singer.metrics.log(logger, Point("timer", "http_request_backoff", delay, tags))
+                time.sleep(delay)
+
+    def _send_request(
+        self,
+        body: bytes,
+        api_url: str,
+        dict_body: dict,
+        request: RequestRecord,
+        page_parser: Optional[EntityPageParser] = None,
+        function_results: bool = False,
+    ) -> Union[Dict, EntityPage]:
+        """Send a serialized request once and check its response."""
+        api_headers = {"content-type": "application/xml", "accept-encoding": "gzip"}
         api_headers.update(self.__headers)
-        body = xmltodict.unparse(dict_body)
 
-        response = requests.post(api_url, headers=api_headers, data=body)
-
-        parsed_xml = xmltodict.parse(response.text)
-        parsed_response = json.loads(json.dumps(parsed_xml))
+        # The rate limit is shared by every thread and client of the company
+        self.rate_limiter.acquire()
+        request.attempts += 1
+        request.bytes_sent += len(body)
+        started_at = time.monotonic()
+        try:
+            response = self.__transport.post(
+                api_url,
+                headers=api_headers,
+                data=body,
+                timeout=self.__timeout,
+                stream=page_parser is not None,
+            )
+        finally:
+            # Streamed responses are only read up to their headers here
+            request.add_phase("network", time.monotonic() - started_at)
+        if response.status_code in THROTTLED_STATUS_CODES:
+            self.rate_limiter.on_throttle()
+        else:
+            self.rate_limiter.on_response(time.monotonic() - started_at)
+
+        content = None
+        if page_parser is not None and response.status_code == 200:
+            started_at = time.perf_counter()
+            try:
+                page, content = page_parser.parse(self._counted_chunks(response, request))
+            finally:
+                response.close()
+                # Includes receiving the body, which is parsed as it arrives
+                request.add_phase("parse", time.perf_counter() - started_at)
+            if page is not None:
+                return page
+
+        if content is None:
+            content = response.content
+            request.bytes_received += len(content or b"")
+
+        started_at = time.perf_counter()
+        try:
+            # Parsed straight from the body bytes into plain dicts, the XML declares its encoding
+            parsed_response = xmltodict.parse(content, dict_constructor=dict)
+        except ExpatError:
+            # Gateways answer errors with HTML pages
+            if response.status_code == 200:
+                raise
+            parsed_response = response.text
+        finally:
+            request.add_phase("parse", time.perf_counter() - started_at)
 
         if response.status_code == 200:
-            if parsed_response["response"]["control"]["status"] == "success":
-                api_response = parsed_response["response"]["operation"]
-
-            if parsed_response["response"]["control"]["status"] == "failure":
+            control = parsed_response["response"]["control"]
+            if control["status"] == "failure":
                 exception_msg = self.decode_support_id(
                     parsed_response["response"]["errormessage"]
                 )
+                if self._is_duplicate_control_id(exception_msg):
+                    raise DuplicateControlIdError(
+                        "Request already processed: {0}".format(exception_msg),
+                        exception_msg,
+                    )
                 raise WrongParamsError(
                     "Some of the parameters are wrong: {0}".format(exception_msg),
                     exception_msg,
                 )
+            api_response = parsed_response["response"]["operation"]
 
             if api_response["authentication"]["status"] == "failure":
                 raise InvalidTokenError(
@@ -152,10 +454,15 @@ class SageIntacctSDK:
                     api_response["errormessage"],
                 )
 
-            if api_response["result"]["status"] == "success":
+            result = api_response["result"]
+            # Requests with several functions are checked per function by the caller
+            if function_results or isinstance(result, list):
                 return api_response
-            
-            if str(parsed_response).find("BL34000061") != -1:
+
+            if result["status"] == "success":
+                return api_response
+
+            if "BL34000061" in self._error_numbers(result.get("errormessage")):
                 logger.info(f"Payrate Entry {dict_body['request']['operation']['content']} already exists in Intacct for that user and date. Skipping over that entry")
                 return {"result": ""}
 
@@ -181,11 +488,21 @@ class SageIntacctSDK:
         if response.status_code == 498:
             raise ExpiredTokenError("Expired token, try to refresh it: {0}".format(parsed_response), parsed_response)
 
-        if response.status_code == 500:
+        if response.status_code in THROTTLED_STATUS_CODES:
+            raise ThrottledError("Too many requests: {0}".format(parsed_response), parsed_response)
+
+        if response.status_code >= 500:
             raise InternalServerError("Internal server error: {0}".format(parsed_response), parsed_response)
 
         raise SageIntacctSDKError("Error: {0}".format(parsed_response))
 
+    @staticmethod
+    def _counted_chunks(response: requests.Response, request: RequestRecord) -> Iterator[bytes]:
+        """Chunks of a streamed response body, counted as received by the request."""
+        for chunk in response.iter_content(RESPONSE_CHUNK_SIZE):
+            request.bytes_received += len(chunk)
+            yield chunk
+
     def support_id_msg(self, errormessages) -> Union[List, Dict]:
         """Finds whether the error messages is list / dict and assign type and error assignment.
 
@@ -196,10 +513,12 @@ class SageIntacctSDK:
             Error message assignment and type.
         """
         error = {}
-        if isinstance(errormessages["error"], list):
+        if not isinstance(errormessages, dict):
+            return error
+        if isinstance(errormessages.get("error"), list):
             error["error"] = errormessages["error"][0]
             error["type"] = "list"
-        elif isinstance(errormessages["error"], dict):
+        elif isinstance(errormessages.get("error"), dict):
             error["error"] = errormessages["error"]
             error["type"] = "dict"
 
@@ -215,9 +534,10 @@ class SageIntacctSDK:
             Same error message with decoded Support ID.
         """
         support_id_msg = self.support_id_msg(errormessages)
-        data_type = support_id_msg["type"]
-        error = support_id_msg["error"]
-        if error and error["description2"]:
+        data_type = support_id_msg.get("type")
+        error = support_id_msg.get("error")
+        message = None
+        if isinstance(error, dict) and error.get("description2"):
             message = error["description2"]
             support_id = re.search("Support ID: (.*)]", message)
             if support_id and support_id.group(1):
@@ -231,11 +551,14 @@ class SageIntacctSDK:
 
         return errormessages
 
-    def format_and_send_request(self, data: Dict, use_key:bool) -> Union[List, Dict]:
+    def format_and_send_request(
+        self, data: Dict, use_key: bool, idempotent: bool = False
+    ) -> Union[List, Dict]:
         """Format data accordingly to convert them to xml.
 
         Parameters:
             data (dict): HTTP POST body data for the wanted API.
+            idempotent (bool): Derive the control ids from the data so a retried write runs once.
 
         Returns:
             A response from the _post_request (dict).
@@ -255,39 +578,195 @@ class SageIntacctSDK:
         if key == "create":
             data[key].pop("object", None)
 
+        function = {function_type: function_body}
+        if idempotent:
+            function_control_id = self._idempotent_control_ids([function], uuid.uuid4().hex)[0]
+            request_control_id = str(uuid.uuid5(uuid.NAMESPACE_OID, function_control_id))
+        else:
+            function_control_id = str(uuid.uuid4())
+            request_control_id = None
+
+        try:
+            response = self._post_session_request(
+                {"@controlid": function_control_id, **function}, object_type, request_control_id
+            )
+        except DuplicateControlIdError:
+            # The response to an earlier attempt of this request was lost
+            logger.info(f"Request {request_control_id} to {object_type} was already processed by Intacct")
+            return {"status": "skipped", "function": function_type, "controlid": function_control_id}
+        return response["result"]
+
+    def _session_request_body(
+        self, functions: Union[List[Dict], Dict], control_id: Optional[str] = None
+    ) -> Dict:
+        """Wrap one or more function elements in a session authenticated request.
+
+        With a control_id the request is sent with uniqueid, so Intacct runs it at most once.
+        """
         timestamp = dt.datetime.now()
 
-        dict_body = {
+        return {
             "request": {
                 "control": {
                     "senderid": self.__sender_id,
                     "password": self.__sender_password,
-                    "controlid": timestamp,
-                    "uniqueid": False,
+                    "controlid": control_id or timestamp,
+                    "uniqueid": control_id is not None,
                     "dtdversion": 3.0,
                     "includewhitespace": False,
                 },
                 "operation": {
                     "authentication": {"sessionid": self.__session_id},
-                    "content": {
-                        "function": {"@controlid": str(uuid.uuid4()), function_type: function_body}
-                    },
+                    "content": {"function": functions},
                 },
             }
         }
-        with singer.metrics.http_request_timer(endpoint=object_type):
-            response = self._post_request(dict_body, self.__api_url)
-        return response["result"]
 
-    def get_entity(self, *, object_type: str, fields: List[str]) -> List[Dict]:
+    @staticmethod
+    def _idempotent_control_ids(functions: List[Dict], run_id: str) -> List[str]:
+        """Control ids derived from the run and the content and position of each function.
+
+        Sending the same functions again within a run reuses the same control ids, which
+        lets Intacct recognise a retried write instead of creating it twice, while a later
+        run posting the same content again gets new ones.
+        """
+        control_ids = []
+        for position, function in enumerate(functions):
+            digest = hashlib.sha256(
+                json.dumps(function, sort_keys=True, default=str).encode("utf-8")
+            ).hexdigest()
+            control_ids.append(str(uuid.uuid5(uuid.NAMESPACE_OID, f"{run_id}:{position}:{digest}")))
+        return control_ids
+
+    def send_functions(
+        self,
+        functions: List[Dict],
+        endpoint: str,
+        idempotent: bool = False,
+        run_id: Optional[str] = None,
+    ) -> List[Dict]:
+        """Send several functions in a single request.
+
+        Parameters:
+            functions (list): Function bodies keyed by the function name, e.g. {"query": {...}}.
+            endpoint (str): Name used for the request metrics.
+            idempotent (bool): Use control ids derived from the functions and mark the request unique.
+            run_id (str): Run the idempotent control ids are derived for, a new one by default.
+
+        Returns:
+            The result of each function (dict), in the same order as functions. When Intacct
+            already processed an idempotent request, every function has the status "skipped".
+        """
+        request_control_id = None
+        if idempotent:
+            control_ids = self._idempotent_control_ids(functions, run_id or uuid.uuid4().hex)
+            request_control_id = str(uuid.uuid5(uuid.NAMESPACE_OID, ",".join(control_ids)))
+        else:
+            control_ids = [str(uuid.uuid4()) for _ in functions]
+        try:
+            response = self._post_session_request(
+                [
+                    {"@controlid": control_id, **function}
+                    for control_id, function in zip(control_ids, functions)
+                ],
+                endpoint,
+                request_control_id,
+                function_results=True,
+            )
+        except DuplicateControlIdError:
+            # The response to an earlier attempt of this request was lost
+            logger.info(
+                f"Request {request_control_id} to {endpoint} was already processed by Intacct, "
+                f"skipping its {len(functions)} functions"
+            )
+            return [
+                {"status": "skipped", "function": next(iter(function)), "controlid": control_id}
+                for control_id, function in zip(control_ids, functions)
+            ]
+
+        results = response["result"]
+        if isinstance(results, dict):
+            results = [results]
+        results_by_control_id = {result["controlid"]: result for result in results}
+        return [results_by_control_id[control_id] for control_id in control_ids]
+
+    def get_entity(
+        self, *, object_type: str, fields: List[str], refresh: bool = False
+    ) -> List[Dict]:
         """Get multiple objects of a single type from Sage Intacct.
 
+        Pages are planned from the total count and fetched concurrently on
+        up to page_fetch_workers threads, then merged in offset order.
+        Served from the reference cache when one is configured, unless refresh is set.
+
         Returns:
             List of Dict in object_type schema.
         """
+        if self.reference_cache and not refresh:
+            intacct_objects = self.reference_cache.get(
+                self.__company_id, self.entity_id, object_type, fields
+            )
+            if intacct_objects is not None:
+                return intacct_objects
+
+        intacct_objects = self._download_entity(object_type, fields)
+        if self.reference_cache:
+            self.reference_cache.set(
+                self.__company_id, self.entity_id, object_type, fields, intacct_objects
+            )
+        return intacct_objects
+
+    def _download_entity(self, object_type: str, fields: List[str]) -> List[Dict]:
+        """Download every object of a single type from Sage Intacct."""
+        return [dict(zip(fields, row)) for row in self.iter_entity(object_type, fields)]
+
+    def iter_entity(
+        self, object_type: str, fields: List[str], pagesize: int = 1000
+    ) -> Iterator[Tuple]:
+        """Iterate over the objects of a single type in Sage Intacct, page by page.
+
+        Each page is parsed as it is received, keeping only the selected fields, and
+        released once its rows are consumed. Pages after the first are fetched on up
+        to page_fetch_workers threads, at most page_fetch_workers pages ahead, so memory
+        stays flat however many objects there are. The reference cache is not used.
+
+        Returns:
+            Iterator of tuples of the field values of each object, in the order of fields.
+        """
         intacct_object_type = INTACCT_OBJECTS[object_type]
-        total_intacct_objects = []
-        get_count = {
+        page_parser = EntityPageParser(intacct_object_type, fields)
+
+        def get_page(offset):
+            function = self._entity_page_query(intacct_object_type, fields, pagesize, offset)
+            return self._post_session_request(
+                {"@controlid": str(uuid.uuid4()), **function},
+                intacct_object_type,
+                page_parser=page_parser,
+            )
+
+        page = get_page(0)
+        total_count = page.total_count
+        yield from page.rows
+        del page
+
+        for page in post_concurrently(
+            get_page, range(pagesize, total_count, pagesize), self.page_fetch_workers, self.page_fetch_workers
+        ):
+            yield from page.rows
+
+    def _get_entity_page(
+        self, intacct_object_type: str, fields: List[str], pagesize: int, offset: int
+    ) -> List[Dict]:
+        """Get a single page of objects of a single type from Sage Intacct."""
+        data = self._entity_page_query(intacct_object_type, fields, pagesize, offset)
+        return self._entity_page_objects(
+            self.format_and_send_request(data, True), intacct_object_type
+        )
+
+    @staticmethod
+    def _count_query(intacct_object_type: str) -> Dict:
+        """Build the query function returning the number of objects of a type."""
+        return {
             "query": {
                 "object": intacct_object_type,
                 "select": {"field": "RECORDNO"},
@@ -296,31 +775,249 @@ class SageIntacctSDK:
             }
         }
 
-        response = self.format_and_send_request(get_count, True)
-        count = int(response["data"]["@totalcount"])
+    @staticmethod
+    def _entity_page_query(
+        intacct_object_type: str, fields: List[str], pagesize: int, offset: int
+    ) -> Dict:
+        """Build the query function for a single page of objects."""
+        return {
+            "query": {
+                "object": intacct_object_type,
+                "select": {"field": fields},
+                "options": {"showprivate": "true"},
+                "pagesize": pagesize,
+                "offset": offset,
+            }
+        }
+
+    @staticmethod
+    def _entity_page_objects(result: Dict, intacct_object_type: str) -> List[Dict]:
+        """Extract the objects from the result of a page query."""
+        intacct_objects = result["data"].get(intacct_object_type, [])
+        # When only 1 object is found, Intacct returns a dict, otherwise it returns a list of dicts.
+        if isinstance(intacct_objects, dict):
+            intacct_objects = [intacct_objects]
+        return intacct_objects
+
+    def get_entities(
+        self, object_fields: Dict[str, List[str]], refresh: bool = False
+    ) -> Dict[str, List[Dict]]:
+        """Get multiple objects of several types from Sage Intacct.
+
+        Object types found in the reference cache are served from it unless refresh
+        is set; the rest are downloaded with _download_entities and cached.
+
+        Parameters:
+            object_fields (dict): Fields to select, keyed by object type.
+            refresh (bool): Ignore cached entries.
+
+        Returns:
+            Dict of object type to List of Dict in object_type schema.
+        """
+        total_intacct_objects = {}
+        if self.reference_cache and not refresh:
+            for object_type, fields in object_fields.items():
+                intacct_objects = self.reference_cache.get(
+                    self.__company_id, self.entity_id, object_type, fields
+                )
+                if intacct_objects is not None:
+                    total_intacct_objects[object_type] = intacct_objects
+
+        downloaded = self._download_entities(
+            {
+                object_type: fields
+                for object_type, fields in object_fields.items()
+                if object_type not in total_intacct_objects
+            }
+        )
+        if self.reference_cache:
+            for object_type, intacct_objects in downloaded.items():
+                self.reference_cache.set(
+                    self.__company_id,
+                    self.entity_id,
+                    object_type,
+                    object_fields[object_type],
+                    intacct_objects,
+                )
+        total_intacct_objects.update(downloaded)
+
+        return {object_type: total_intacct_objects[object_type] for object_type in object_fields}
+
+    def _download_entities(self, object_fields: Dict[str, List[str]]) -> Dict[str, List[Dict]]:
+        """Download every object of several types from Sage Intacct.
+
+        The first page of every object type is requested in a single multi-function
+        request; its @totalcount replaces the separate count query. Only the
+        remaining pages are then fetched, concurrently, as in get_entity.
+
+        Parameters:
+            object_fields (dict): Fields to select, keyed by object type.
+
+        Returns:
+            Dict of object type to List of Dict in object_type schema.
+        """
         pagesize = 1000
-        offset = 0
-        for _i in range(0, count, pagesize):
-            data = {
-                "query": {
-                    "object": intacct_object_type,
-                    "select": {"field": fields},
-                    "options": {"showprivate": "true"},
-                    "pagesize": pagesize,
-                    "offset": offset,
+        object_types = list(object_fields)
+        if not object_types:
+            return {}
+
+        first_pages = self.send_functions(
+            [
+                self._entity_page_query(
+                    INTACCT_OBJECTS[object_type], object_fields[object_type], pagesize, 0
+                )
+                for object_type in object_types
+            ],
+            endpoint="reference_data",
+        )
+
+        total_intacct_objects = {}
+        remaining_pages = []
+        for object_type, result in zip(object_types, first_pages):
+            self._check_function_result(result)
+            total_intacct_objects[object_type] = self._entity_page_objects(
+                result, INTACCT_OBJECTS[object_type]
+            )
+            count = int(result["data"]["@totalcount"])
+            remaining_pages.extend(
+                (object_type, offset) for offset in range(pagesize, count, pagesize)
+            )
+
+        def get_page(page):
+            object_type, offset = page
+            return self._get_entity_page(
+                INTACCT_OBJECTS[object_type], object_fields[object_type], pagesize, offset
+            )
+
+        if remaining_pages:
+            with ThreadPoolExecutor(
+                max_workers=min(self.page_fetch_workers, len(remaining_pages))
+            ) as executor:
+                for (object_type, _offset), intacct_objects in zip(
+                    remaining_pages, executor.map(get_page, remaining_pages)
+                ):
+                    total_intacct_objects[object_type].extend(intacct_objects)
+
+        return total_intacct_objects
+
+    def get_existing_values(
+        self, object_values: Dict[str, Tuple[str, Iterable]], cached: Optional[Set[str]] = None
+    ) -> Dict[str, Set[str]]:
+        """Find which input values exist in Sage Intacct, with queries scaled to the input size.
+
+        The counts of all object types are requested in one multi-function request.
+        Object types with fewer distinct values than full_download_ratio of their
+        count are checked with "in" filtered queries over chunks of the values,
+        several queries per request; the others, and object types in the reference
+        cache, are checked against the full list of objects, streamed with
+        iter_entity when there is no reference cache to fill.
+
+        Parameters:
+            object_values (dict): Field and input values to look up, keyed by object type.
+            cached (set): Optional set the object types served from the reference cache are added to.
+
+        Returns:
+            Dict of object type to the set of the normalized values found in Intacct.
+        """
+        existing_values = {}
+        values_to_check = {}
+        for object_type, (field, values) in object_values.items():
+            distinct_values = {normalize_key(value) for value in values if value}
+            cached_objects = None
+            if distinct_values and self.reference_cache:
+                cached_objects = self.reference_cache.get(
+                    self.__company_id, self.entity_id, object_type, [field]
+                )
+            if not distinct_values:
+                existing_values[object_type] = set()
+            elif cached_objects is not None:
+                existing_values[object_type] = self._field_values(cached_objects, field)
+                if cached is not None:
+                    cached.add(object_type)
+            else:
+                values_to_check[object_type] = (field, distinct_values)
+
+        if not values_to_check:
+            return existing_values
+
+        counts = self.send_functions(
+            [self._count_query(INTACCT_OBJECTS[object_type]) for object_type in values_to_check],
+            endpoint="reference_counts",
+        )
+
+        full_downloads = {}
+        queries = []
+        for (object_type, (field, distinct_values)), result in zip(values_to_check.items(), counts):
+            self._check_function_result(result)
+            count = int(result["data"]["@totalcount"])
+            if len(distinct_values) >= count * self.full_download_ratio:
+                full_downloads[object_type] = [field]
+                continue
+
+            existing_values[object_type] = set()
+            distinct_values = sorted(distinct_values)
+            for start in range(0, len(distinct_values), EXISTENCE_QUERY_CHUNK_SIZE):
+                queries.append(
+                    (object_type, field, distinct_values[start:start + EXISTENCE_QUERY_CHUNK_SIZE])
+                )
+
+        if full_downloads and self.reference_cache:
+            # Downloaded as objects so they are cached for the next runs
+            for object_type, intacct_objects in self.get_entities(full_downloads).items():
+                existing_values[object_type] = self._field_values(
+                    intacct_objects, full_downloads[object_type][0]
+                )
+        else:
+            for object_type, (field,) in full_downloads.items():
+                existing_values[object_type] = {
+                    normalize_key(value)
+                    for (value,) in self.iter_entity(object_type, [field])
+                    if value is not None
                 }
-            }
-            intacct_objects = self.format_and_send_request(data, True)["data"][
-                intacct_object_type
+
+        def run_queries(batch):
+            functions = [
+                {
+                    "query": {
+                        "object": INTACCT_OBJECTS[object_type],
+                        "select": {"field": [field]},
+                        "filter": {"in": {"field": field, "value": chunk}},
+                        "options": {"showprivate": "true"},
+                        "pagesize": len(chunk),
+                    }
+                }
+                for object_type, field, chunk in batch
             ]
-            # When only 1 object is found, Intacct returns a dict, otherwise it returns a list of dicts.
-            if isinstance(intacct_objects, dict):
-                intacct_objects = [intacct_objects]
+            return batch, self.send_functions(functions, endpoint="existence_check")
+
+        batches = [
+            queries[start:start + EXISTENCE_QUERIES_PER_REQUEST]
+            for start in range(0, len(queries), EXISTENCE_QUERIES_PER_REQUEST)
+        ]
+        for batch, results in post_concurrently(run_queries, batches, self.page_fetch_workers):
+            for (object_type, field, _chunk), result in zip(batch, results):
+                self._check_function_result(result)
+                existing_values[object_type].update(
+                    self._field_values(
+                        self._entity_page_objects(result, INTACCT_OBJECTS[object_type]), field
+                    )
+                )
 
-            total_intacct_objects = total_intacct_objects + intacct_objects
+        return existing_values
 
-            offset = offset + pagesize
-        return total_intacct_objects
+    @staticmethod
+    def _field_values(intacct_objects: List[Dict], field: str) -> Set[str]:
+        """Normalized values of a field of Intacct objects."""
+        return {normalize_key(o[field]) for o in intacct_objects if o.get(field) is not None}
+
+    def _check_function_result(self, result: Dict) -> None:
+        """Raise if a function of a multi-function request failed."""
+        if result["status"] != "success":
+            exception_msg = self.decode_support_id(result["errormessage"])
+            raise WrongParamsError(
+                "Some of the parameters are wrong: {0}".format(exception_msg),
+                exception_msg,
+            )
 
     def get_sample(self, intacct_object: str):
         """Get a sample of data from an endpoint, useful for determining schemas.
@@ -362,9 +1059,127 @@ class SageIntacctSDK:
         """Post journal to Intacct"""
         data = {"create": {"object": "GLBATCH", "GLBATCH": journal}}
 
-        response = self.format_and_send_request(data, True)
+        response = self.format_and_send_request(data, True, idempotent=True)
         return response
     
+    def post_journals(self, journals: List[Dict]) -> List[Dict]:
+        """Post journals to Intacct, splitting the large ones into several GLBATCHes.
+
+        Journals above journal_max_lines lines or journal_max_bytes of serialized lines
+        are split into evenly sized batches titled "<BATCH_TITLE> (i/n)". Up to
+        post_workers batches are posted concurrently. Once a batch fails, the batches
+        not sent yet are skipped and, with journal_rollback, the posted ones are deleted.
+
+        Parameters:
+            journals (list): GLBATCH bodies with their lines under ENTRIES.GLENTRY.
+
+        Returns:
+            The result of each batch (dict), in order, with its BATCH_TITLE, number of
+            LINES and status: "success" with the RECORDNO, "failure" with the
+            errormessage, "skipped" or "rolled back".
+        """
+        batches = [batch for journal in journals for batch in self._split_journal(journal)]
+        failed = threading.Event()
+
+        def post(batch):
+            result = {"BATCH_TITLE": batch["BATCH_TITLE"], "LINES": len(batch["ENTRIES"]["GLENTRY"])}
+            if failed.is_set():
+                return {**result, "status": "skipped"}
+            try:
+                response = self.post_journal(batch)
+            except SageIntacctSDKError as e:
+                failed.set()
+                return {**result, "status": "failure", "errormessage": e.message}
+            except requests.exceptions.RequestException as e:
+                # Connection failures and timeouts left after the retries
+                failed.set()
+                return {**result, "status": "failure", "errormessage": f"{type(e).__name__}: {e}"}
+            return {**result, "status": "success", "RECORDNO": self._result_recordno(response)}
+
+        results = list(post_concurrently(post, batches, self.post_workers, self.max_in_flight))
+        for result in results:
+            if result["status"] == "success":
+                logger.info(
+                    f"Posted journal batch {result['BATCH_TITLE']} with {result['LINES']} lines as RECORDNO {result['RECORDNO']}"
+                )
+
+        if failed.is_set() and self.journal_rollback:
+            for result in results:
+                if result["status"] != "success" or result["RECORDNO"] is None:
+                    continue
+                try:
+                    self.delete_journal(result["RECORDNO"])
+                except SageIntacctSDKError as e:
+                    logger.error(f"Failed to roll back journal batch RECORDNO {result['RECORDNO']}: {e.message}")
+                    continue
+                except requests.exceptions.RequestException as e:
+                    # Connection failures and timeouts left after the retries
+                    logger.error(
+                        f"Failed to roll back journal batch RECORDNO {result['RECORDNO']}: {type(e).__name__}: {e}"
+                    )
+                    continue
+                logger.info(f"Rolled back journal batch RECORDNO {result['RECORDNO']}")
+                result["status"] = "rolled back"
+
+        return results
+
+    def _split_journal(self, journal: Dict) -> List[Dict]:
+        """Split a journal into evenly sized batches within the journal line and size limits."""
+        lines = journal["ENTRIES"]["GLENTRY"]
+        if isinstance(lines, dict):
+            lines = [lines]
+        offsets = [0, *itertools.accumulate(
+            len(to_xml({"GLENTRY": line}, full_document=False).encode("utf-8"))
+            for line in lines
+        )]
+
+        batch_count = max(
+            1,
+            math.ceil(len(lines) / self.journal_max_lines),
+            math.ceil(offsets[-1] / self.journal_max_bytes),
+        )
+        while True:
+            bounds = [round(i * len(lines) / batch_count) for i in range(batch_count + 1)]
+            if batch_count >= len(lines) or all(
+                offsets[end] - offsets[start] <= self.journal_max_bytes
+                for start, end in zip(bounds, bounds[1:])
+            ):
+                break
+            batch_count += 1
+
+        if batch_count == 1:
+            return [journal]
+
+        logger.info(f"Splitting journal {journal['BATCH_TITLE']} of {len(lines)} lines into {batch_count} batches")
+        return [
+            {
+                **journal,
+                "BATCH_TITLE": f"{journal['BATCH_TITLE']} ({number}/{batch_count})",
+                "ENTRIES": {"GLENTRY": lines[start:end]},
+            }
+            for number, (start, end) in enumerate(zip(bounds, bounds[1:]), start=1)
+        ]
+
+    @staticmethod
+    def _result_recordno(result) -> Optional[str]:
+        """Returns the RECORDNO of the record created by a function, if Intacct returned it."""
+        if not isinstance(result, dict):
+            return None
+        # Legacy functions return the key of the record they created
+        if result.get("key") is not None:
+            return str(result["key"])
+        data = result.get("data")
+        if not isinstance(data, dict):
+            return None
+        for name, created in data.items():
+            if name.startswith("@"):
+                continue
+            if isinstance(created, list):
+                created = created[0] if created else None
+            if isinstance(created, dict) and created.get("RECORDNO") is not None:
+                return created["RECORDNO"]
+        return None
+
     def delete_journal(self, recordno):
         """Delete journal from Intacct"""
         data = {"delete": {"object": "GLBATCH", "keys": recordno}}
@@ -376,23 +1191,184 @@ class SageIntacctSDK:
         """Post employee rate to Intacct"""
         data = {"object": "create_employeerate", "create_employeerate": employee_rate}
 
-        response = self.format_and_send_request(data, False)
+        response = self.format_and_send_request(data, False, idempotent=True)
         return response
     
     def post_other_receipt(self, receipt_data):
         """Post other receipt to Intacct"""
         data = {"object": "record_otherreceipt", "record_otherreceipt": receipt_data}
 
-        response = self.format_and_send_request(data, False)
+        response = self.format_and_send_request(data, False, idempotent=True)
         return response
     
     def post_manual_payment(self, payment_data):
         """Post manual payment to Intacct"""
         data = {"object": "create_appayment", "create_appayment": payment_data}
 
-        response = self.format_and_send_request(data, False)
+        response = self.format_and_send_request(data, False, idempotent=True)
         return response
 
+    def post_batch(
+        self,
+        functions: List[Dict],
+        endpoint: str,
+        on_posted: Optional[Callable[[int], None]] = None,
+    ) -> List[Dict]:
+        """Post write functions to Intacct, packing several functions into each request.
+
+        Requests hold up to write_batch_size functions and, past the first function,
+        at most write_batch_max_bytes of serialized functions. Up to post_workers
+        requests are sent concurrently.
+
+        With a ledger, functions a previous run already posted are not sent again and the
+        records posted by each request are added to the ledger as soon as it completes.
+        Once every function is posted without a failure, they are removed from the ledger
+        again, so it only holds the records of interrupted or failed uploads. The progress
+        of the endpoint is logged and reported as a records_posted metric after every request.
+        The control ids of the requests are derived from the run id kept in the ledger, so a
+        run resuming an interrupted upload is recognised by Intacct when it sends a request
+        again whose response was lost.
+
+        Parameters:
+            functions (list): Function bodies keyed by the function name, e.g. {"create_appayment": {...}}.
+            endpoint (str): Name used for the request metrics.
+            on_posted (callable): Optional callback taking the number of leading functions
+                posted or skipped, called whenever it grows. It stops at the first failure.
+
+        Returns:
+            The result of each function (dict), in the same order as functions. Failed
+            functions have the status "failure" and their decoded errormessage; functions
+            rejected because the record already exists (BL34000061), sent again in a request
+            Intacct already processed or found in the ledger have the status "skipped". Posted records have their RECORDNO when
+            Intacct returns it.
+        """
+        results: List[Optional[Dict]] = [None] * len(functions)
+        keys = None
+        pending = list(range(len(functions)))
+        if self.ledger is not None:
+            keys = record_keys(functions, self.__company_id, self.entity_id, endpoint)
+            pending = []
+            for index, key in enumerate(keys):
+                if key in self.ledger:
+                    results[index] = {"status": "skipped", "RECORDNO": self.ledger.get(key)}
+                else:
+                    pending.append(index)
+            if len(pending) < len(functions):
+                logger.info(
+                    f"Skipping {len(functions) - len(pending)} of {len(functions)} {endpoint} records already posted"
+                )
+
+        # Kept in the ledger, so a resumed run sends the requests of the interrupted one again
+        # with the same control ids
+        run_id = self.ledger.begin_run() if self.ledger is not None else uuid.uuid4().hex
+
+        def send_batch(batch):
+            return batch, self.send_functions(
+                [functions[index] for index in batch], endpoint, idempotent=True, run_id=run_id
+            )
+
+        # Functions before the first one not posted or skipped yet, reported to on_posted
+        leading = 0
+
+        def report_leading():
+            nonlocal leading
+            start = leading
+            while (
+                leading < len(results)
+                and results[leading] is not None
+                and results[leading]["status"] != "failure"
+            ):
+                leading += 1
+            if on_posted is not None and leading > start:
+                on_posted(leading)
+
+        report_leading()
+        done = len(functions) - len(pending)
+        for batch, batch_results in post_concurrently(
+            send_batch, self._split_batch(pending, functions), self.post_workers, self.max_in_flight
+        ):
+            recordnos = {}
+            for index, result in zip(batch, batch_results):
+                if result["status"] == "success":
+                    result["RECORDNO"] = self._result_recordno(result)
+                elif result["status"] == "failure":
+                    result["errormessage"] = self.decode_support_id(result["errormessage"])
+                    if "BL34000061" in self._error_numbers(result["errormessage"]):
+                        logger.info(f"Entry {functions[index]} already exists in Intacct. Skipping over that entry")
+                        result["status"] = "skipped"
+                if keys and result["status"] != "failure":
+                    recordnos[keys[index]] = result.get("RECORDNO")
+                results[index] = result
+
+            if self.ledger is not None:
+                self.ledger.add(recordnos)
+            done += sum(results[index]["status"] != "failure" for index in batch)
+            singer.metrics.log(
+                logger,
+                Point(
+                    "counter",
+                    "records_posted",
+                    sum(results[index]["status"] == "success" for index in batch),
+                    {"endpoint": endpoint},
+                ),
+            )
+            logger.info(f"{done} of {len(functions)} {endpoint} records posted or skipped")
+            report_leading()
+
+        if self.ledger is not None:
+            if all(result["status"] != "failure" for result in results):
+                self.ledger.remove(keys)
+            # Every request was answered, a later upload must not be taken for a retry of this one
+            self.ledger.new_run()
+        return results
+
+    def _split_batch(self, indexes: List[int], functions: List[Dict]):
+        """Yield lists of function indexes within the batch size and payload limits."""
+        batch = []
+        batch_bytes = 0
+        for index in indexes:
+            function_bytes = len(to_xml({"function": functions[index]}, full_document=False).encode("utf-8"))
+            if batch and (
+                len(batch) >= self.write_batch_size
+                or batch_bytes + function_bytes > self.write_batch_max_bytes
+            ):
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append(index)
+            batch_bytes += function_bytes
+        if batch:
+            yield batch
+
+    @classmethod
+    def _is_duplicate_control_id(cls, errormessages: Union[Dict, List, None]) -> bool:
+        """Whether the control errors of a request report its unique control id as already used."""
+        if cls._error_numbers(errormessages) & DUPLICATE_CONTROL_ID_ERRORS:
+            return True
+        errors = errormessages.get("error") if isinstance(errormessages, dict) else None
+        if isinstance(errors, dict):
+            errors = [errors]
+        for error in errors or []:
+            description = f"{error.get('description') or ''} {error.get('description2') or ''}"
+            if re.search(r"control ?id", description, re.IGNORECASE) and re.search(
+                r"already|duplicate|unique", description, re.IGNORECASE
+            ):
+                return True
+        return False
+
+    @staticmethod
+    def _error_numbers(errormessages: Union[Dict, List, None]) -> set:
+        """Returns the error numbers of one or more errormessage elements."""
+        if isinstance(errormessages, dict):
+            errormessages = [errormessages]
+        error_numbers = set()
+        for errormessage in errormessages or []:
+            errors = errormessage.get("error") if isinstance(errormessage, dict) else None
+            if isinstance(errors, dict):
+                errors = [errors]
+            error_numbers.update(error.get("errorno") for error in errors or [])
+        return error_numbers
+
 def get_client(
     *,
     api_url: str,
@@ -403,6 +1379,25 @@ def get_client(
     user_password: str,
     headers: Dict,
     entity_id: str,
+    page_fetch_workers: int = DEFAULT_PAGE_FETCH_WORKERS,
+    reference_cache: Optional[ReferenceCache] = None,
+    session_cache: Optional[SessionCache] = None,
+    transport: Optional[requests.Session] = None,
+    connect_timeout: float = DEFAULT_HTTP_CONNECT_TIMEOUT,
+    read_timeout: float = DEFAULT_HTTP_READ_TIMEOUT,
+    write_batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+    write_batch_max_bytes: int = DEFAULT_WRITE_BATCH_MAX_BYTES,
+    post_workers: int = DEFAULT_POST_WORKERS,
+    max_in_flight: Optional[int] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    retry_backoff_base: float = DEFAULT_RETRY_BACKOFF_BASE,
+    retry_backoff_max: float = DEFAULT_RETRY_BACKOFF_MAX,
+    full_download_ratio: float = DEFAULT_FULL_DOWNLOAD_RATIO,
+    journal_max_lines: int = DEFAULT_JOURNAL_MAX_LINES,
+    journal_max_bytes: int = DEFAULT_JOURNAL_MAX_BYTES,
+    journal_rollback: bool = False,
+    ledger: Optional[PostingLedger] = None,
 ) -> SageIntacctSDK:
     """Initializes and returns a SageIntacctSDK object."""
     connection = SageIntacctSDK(
@@ -414,6 +1409,25 @@ def get_client(
         user_password=user_password,
         headers=headers,
         entity_id=entity_id,
+        page_fetch_workers=page_fetch_workers,
+        reference_cache=reference_cache,
+        session_cache=session_cache,
+        transport=transport,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        write_batch_size=write_batch_size,
+        write_batch_max_bytes=write_batch_max_bytes,
+        post_workers=post_workers,
+        max_in_flight=max_in_flight,
+        rate_limiter=rate_limiter,
+        max_retries=max_retries,
+        retry_backoff_base=retry_backoff_base,
+        retry_backoff_max=retry_backoff_max,
+        full_download_ratio=full_download_ratio,
+        journal_max_lines=journal_max_lines,
+        journal_max_bytes=journal_max_bytes,
+        journal_rollback=journal_rollback,
+        ledger=ledger,
     )
 
     return connection
@@ -43,6 +43,51 @@ INTACCT_OBJECTS = {
     "vendors": "VENDOR",
 }
 
+# Intacct field name to the GLENTRY field it is written to on a journal entry line.
+JOURNAL_ENTRY_FIELD_NAMES = {
+    "ACCOUNTNO": "ACCOUNTNO",
+    "CLASSID": "CLASSID",
+    "CUSTOMERID": "CUSTOMERID",
+    "DEPARTMENTID": "DEPARTMENT",
+    "EMPLOYEEID": "EMPLOYEEID",
+    "ITEMID": "ITEMID",
+    "LOCATIONID": "LOCATION",
+    "PROJECTID": "PROJECTID",
+    "VENDORID": "VENDORID",
+}
+
+# Dimension input columns of statistical journals with the Intacct object and field they reference.
+STATISTICAL_JOURNAL_DIMENSIONS = {
+    "employeeid": ("employees", "EMPLOYEEID"),
+    "classid": ("classes", "CLASSID"),
+    "locationid": ("locations", "LOCATIONID"),
+    "departmentid": ("departments", "DEPARTMENTID"),
+    "customerid": ("customers", "CUSTOMERID"),
+    "projectid": ("projects", "PROJECTID"),
+    "itemid": ("items", "ITEMID"),
+    "vendorid": ("vendors", "VENDORID"),
+}
+
+# Input columns of payroll journals with the Intacct object and field they reference.
+PAYROLL_JOURNAL_COLUMNS = {
+    "AccountNumber": ("general_ledger_accounts", "ACCOUNTNO"),
+    "BusinessUnit": ("classes", "CLASSID"),
+    "locationid": ("locations", "LOCATIONID"),
+    "PracticeAreaID": ("departments", "DEPARTMENTID"),
+}
+
+# Input columns holding amounts or date parts, the only columns buffered as numeric arrays.
+# Statistical journal amount columns are matched by their "amount" prefix
+ARITHMETIC_INPUT_COLUMNS = {
+    "day",
+    "gross_amount",
+    "month",
+    "payout_amount",
+    "total_fees",
+    "total_sales_tax",
+    "year"
+}
+
 PAYMENT_RECORDS_REQUIRED_COLS = {
     "day",
     "gross_amount",
@@ -55,3 +100,76 @@ PAYMENT_RECORDS_REQUIRED_COLS = {
 }
 
 DEFAULT_API_URL = "https://api.intacct.com/ia/xml/xmlgw.phtml"
+
+# Key of the target's progress in the STATE messages passed on from the tap
+TARGET_STATE_KEY = "target_intacct"
+
+# Stays within Intacct's base concurrency allowance, like DEFAULT_POST_WORKERS
+DEFAULT_PAGE_FETCH_WORKERS = 2
+
+DEFAULT_HTTP_POOL_SIZE = 10
+
+DEFAULT_HTTP_CONNECT_TIMEOUT = 10
+
+DEFAULT_HTTP_READ_TIMEOUT = 300
+
+# Bytes of a streamed query page handed to the parser at a time
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+DEFAULT_WRITE_BATCH_SIZE = 50
+
+DEFAULT_WRITE_BATCH_MAX_BYTES = 1024 * 1024
+
+DEFAULT_JOURNAL_MAX_LINES = 5000
+
+DEFAULT_JOURNAL_MAX_BYTES = 2 * 1024 * 1024
+
+DEFAULT_RATE_LIMIT = 10
+
+DEFAULT_RATE_LIMIT_MIN = 1
+
+# Requests per second added to the rate limit after every healthy response
+DEFAULT_RATE_LIMIT_INCREASE = 0.1
+
+DEFAULT_SLOW_RESPONSE_SECONDS = 30
+
+# HTTP status codes Intacct answers with when it throttles requests
+THROTTLED_STATUS_CODES = {429, 503}
+
+DEFAULT_MAX_RETRIES = 3
+
+# Control errors Intacct answers a request with when its unique control id was already used
+DUPLICATE_CONTROL_ID_ERRORS = {"XL03000009"}
+
+DEFAULT_RETRY_BACKOFF_BASE = 1
+
+DEFAULT_RETRY_BACKOFF_MAX = 60
+
+# Intacct allows two concurrent requests per company on its base performance tier
+DEFAULT_POST_WORKERS = 2
+
+DEFAULT_REFERENCE_CACHE_TTL = 3600
+
+DEFAULT_REFERENCE_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+# Seconds a new API session is assumed to stay valid when Intacct does not report its timeout
+DEFAULT_SESSION_TIMEOUT = 1800
+
+# Input values looked up by each "in" filtered existence query, and queries sent per request
+EXISTENCE_QUERY_CHUNK_SIZE = 500
+
+EXISTENCE_QUERIES_PER_REQUEST = 10
+
+# Share of an object type's count the distinct input values must reach before every object
+# is downloaded instead of queried by value, which is only worth it when the input
+# references most of the tenant's objects
+DEFAULT_FULL_DOWNLOAD_RATIO = 0.8
+
+# Requests taking longer are logged with their control id and phases
+DEFAULT_SLOW_REQUEST_SECONDS = 10
+
+# Slowest requests kept in the metrics report
+SLOW_REQUESTS_KEPT = 100
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+REQUEST_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
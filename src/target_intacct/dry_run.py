@@ -0,0 +1,146 @@
+"""
+Offline client running the whole upload pipeline without calling Intacct
+"""
+import json
+import threading
+import time
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import singer
+
+from .client import SageIntacctSDK
+from .const import INTACCT_OBJECTS
+from .reference import normalize_key
+from .request_xml import to_xml
+from .timing import RequestRecord
+
+logger = singer.get_logger()
+
+
+def load_reference_snapshot(path: str) -> Dict[str, List[Dict]]:
+    """Load a reference snapshot, a JSON object of object type to the list of its objects."""
+    with open(path, "r", encoding="utf-8") as snapshot_file:
+        snapshot = json.load(snapshot_file)
+    unknown = set(snapshot) - set(INTACCT_OBJECTS)
+    if unknown:
+        raise Exception(f"Reference snapshot has unknown object types {sorted(unknown)}")
+    return snapshot
+
+
+class DryRunSDK(SageIntacctSDK):
+    """SageIntacctSDK serving reference data from a snapshot and posting nowhere.
+
+    Requests are built and serialized exactly as in a real run, then written to output
+    or discarded, and every function is answered with a success holding a made up key.
+    Nothing is sent, so no credentials are needed.
+    """
+
+    def __init__(
+        self,
+        reference_snapshot: Dict[str, List[Dict]],
+        output: Optional[BinaryIO] = None,
+        **kwargs,
+    ):
+        """
+        :param reference_snapshot: Objects of each object type, as returned by get_entities
+        :param output: Optional binary file the serialized request bodies are written to
+        :param kwargs: Parameters of SageIntacctSDK
+        """
+        self.reference_snapshot = reference_snapshot
+        self.output = output
+        self.requests = 0
+        self.request_bytes = 0
+        self._keys = 0
+        self._output_lock = threading.Lock()
+        kwargs.update(session_cache=None, reference_cache=None, ledger=None)
+        super().__init__(**kwargs)
+
+    def _post_request(
+        self,
+        dict_body: dict,
+        api_url: str,
+        request: RequestRecord,
+        page_parser=None,
+        function_results: bool = False,
+    ) -> Dict:
+        operation = dict_body["request"]["operation"]
+        if "login" in operation["authentication"]:
+            return {
+                "authentication": {"status": "success"},
+                "result": {
+                    "status": "success",
+                    "data": {"api": {"sessionid": "dry-run", "endpoint": api_url}},
+                },
+            }
+
+        started_at = time.perf_counter()
+        body = to_xml(dict_body).encode("utf-8")
+        request.add_phase("serialize", time.perf_counter() - started_at)
+        request.attempts += 1
+        request.bytes_sent += len(body)
+
+        functions = operation["content"]["function"]
+        if isinstance(functions, dict):
+            functions = [functions]
+        with self._output_lock:
+            self.requests += 1
+            self.request_bytes += len(body)
+            if self.output is not None:
+                self.output.write(body + b"\n")
+            results = []
+            for function in functions:
+                self._keys += 1
+                results.append(
+                    {
+                        "status": "success",
+                        "function": next(name for name in function if not name.startswith("@")),
+                        "controlid": function["@controlid"],
+                        "key": str(self._keys),
+                    }
+                )
+        return {"result": results if len(results) > 1 else results[0]}
+
+    def _snapshot_objects(self, object_type: str) -> List[Dict]:
+        try:
+            return self.reference_snapshot[object_type]
+        except KeyError:
+            raise Exception(f"Reference snapshot has no {object_type}")
+
+    def get_entity(
+        self, *, object_type: str, fields: List[str], refresh: bool = False
+    ) -> List[Dict]:
+        return [
+            {field: o.get(field) for field in fields} for o in self._snapshot_objects(object_type)
+        ]
+
+    def get_entities(
+        self, object_fields: Dict[str, List[str]], refresh: bool = False
+    ) -> Dict[str, List[Dict]]:
+        return {
+            object_type: self.get_entity(object_type=object_type, fields=fields)
+            for object_type, fields in object_fields.items()
+        }
+
+    def iter_entity(
+        self, object_type: str, fields: List[str], pagesize: int = 1000
+    ) -> Iterator[Tuple]:
+        for o in self._snapshot_objects(object_type):
+            yield tuple(o.get(field) for field in fields)
+
+    def get_existing_values(
+        self, object_values: Dict[str, Tuple[str, Iterable]], cached: Optional[Set[str]] = None
+    ) -> Dict[str, Set[str]]:
+        existing_values = {}
+        for object_type, (field, values) in object_values.items():
+            distinct_values = {normalize_key(value) for value in values if value}
+            if distinct_values:
+                distinct_values &= self._field_values(self._snapshot_objects(object_type), field)
+            existing_values[object_type] = distinct_values
+        return existing_values
+
+    def log_summary(self) -> None:
+        """Log the number and size of the requests built."""
+        logger.info(
+            f"Dry run built {self.requests} requests, {self.request_bytes} bytes of XML"
+            + (f" written to {self.output.name}" if self.output is not None else ", discarded")
+        )
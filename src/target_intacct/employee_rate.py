@@ -3,7 +3,11 @@ import pandas as pd
 
 import singer
 
-from .utils import get_input
+from .dry_run import DryRunSDK
+from .reference import load_reference_index_for_values
+from .state import StateCheckpoints
+from .timing import timings
+from .utils import get_input, raise_failed_results, validate_columns
 
 logger = singer.get_logger()
 
@@ -11,27 +15,26 @@ logger = singer.get_logger()
 def employee_rate_upload(intacct_client) -> None:
     """Creates employee rates in Intacct.
 
-    Retrieves objects from Intacct API for verifying input data
+    Looks up the input's employees in Intacct API for verifying input data
     Calls load_entries method
     Sends entries for uploading to Intacct
+    Writes the tap's STATE messages once the records read before them are posted
     """
 
     logger.info("Starting upload.")
+    checkpoints = StateCheckpoints(emit=not isinstance(intacct_client, DryRunSDK))
 
-    # Load Current Data in Intacct for input verification
-    employee_ids = intacct_client.get_entity(
-        object_type="employees", fields=["EMPLOYEEID"]
-    )
-    ids = [a_dict["EMPLOYEEID"] for a_dict in employee_ids]
-    
     # Get input from pipeline
-    input_value = get_input()
+    with timings.stage("read_input"):
+        input_value = get_input(states=checkpoints)
 
-    if not input_value or not isinstance(input_value, list):
-        raise Exception(f"Invalid input data recieved. Input data={input_value}")
-        
-    # Convert input from dictionary to DataFrame
-    data_frame = pd.DataFrame(input_value[0])
+        if not input_value or not isinstance(input_value, list):
+            raise Exception(f"Invalid input data recieved. Input data={input_value}")
+
+        # Convert input from dictionary to DataFrame
+        stream = input_value[0]["stream"]
+        data_frame = pd.DataFrame(input_value[0], copy=False)
+    timings.add("read_input", records=len(data_frame))
 
     # Verify it has required columns
     cols = list(data_frame.columns)
@@ -42,25 +45,52 @@ def employee_rate_upload(intacct_client) -> None:
             f"Input is missing REQUIRED_COLS. Found={cols}, Required={REQUIRED_COLS}"
         )
 
-    for index, row in data_frame.iterrows():
-        if str(row["employeeid"]) in ids:
-            start_date = parse(row["ratestartdate"])
-            year, month, day = start_date.year, start_date.month, start_date.day
-            employee_rate = {
-                    "employeeid": row["employeeid"],
-                    "ratestartdate": {
-                        "year": year,
-                        "month": month,
-                        "day": day
-                    },
-                    "billingrate": row.get("billingrate", ""),
-                    "salaryrate": row.get("salaryrate", ""), 
-            }
-            intacct_client.post_employee_rate(employee_rate)
-           
-        else:
-            raise Exception(
-             f"Invalid Employee ID. Employee ID with the value {row['employeeid']} is missing in Intacct"
+    # Look up the input's Employee IDs in Intacct for input verification
+    with timings.stage("load_reference"):
+        reference_index = load_reference_index_for_values(
+            intacct_client, {"employees": ("EMPLOYEEID", data_frame["employeeid"])}
+        )
+    ids = reference_index.values("employees", "EMPLOYEEID")
+
+    # Report every Employee ID missing in Intacct at once
+    with timings.stage("validate", len(data_frame)):
+        validate_columns(data_frame, {"employeeid": ("EMPLOYEEID", ids)}, "employee_rate")
+
+    with timings.stage("build", len(data_frame)) as stage:
+        employee_rates = build_employee_rates(data_frame)
+        stage.records_out = len(employee_rates)
+
+    with timings.stage("post", len(employee_rates)) as stage:
+        results = intacct_client.post_batch(
+            [{"create_employeerate": employee_rate} for employee_rate in employee_rates],
+            endpoint="create_employeerate",
+            # One employee rate is built per input row
+            on_posted=lambda count: checkpoints.posted(stream, count),
         )
-    
+        stage.records_out = sum(result["status"] != "failure" for result in results)
+    raise_failed_results(employee_rates, results, "employee rates")
+    checkpoints.posted(stream)
+
     logger.info("Upload completed")
+
+
+def build_employee_rates(data_frame):
+    """Builds the employee rates of the input rows."""
+    employee_rates = []
+    for index, row in data_frame.iterrows():
+        start_date = parse(row["ratestartdate"])
+        year, month, day = start_date.year, start_date.month, start_date.day
+        # The key order in this dictionary in required for the Intacct API call to work correctly
+        employee_rate = {
+                "employeeid": row["employeeid"],
+                "ratestartdate": {
+                    "year": year,
+                    "month": month,
+                    "day": day
+                },
+                "billingrate": row.get("billingrate", ""),
+                "salaryrate": row.get("salaryrate", ""), 
+        }
+        employee_rates.append(employee_rate)
+
+    return employee_rates
@@ -34,9 +34,17 @@ class WrongParamsError(SageIntacctSDKError):
     """Some of the parameters (HTTP params or request body) are wrong, 400 error."""
 
 
+class DuplicateControlIdError(WrongParamsError):
+    """Intacct already processed a request with the same unique control id."""
+
+
 class NotFoundItemError(SageIntacctSDKError):
     """Not found the item from URL, 404 error."""
 
 
 class InternalServerError(SageIntacctSDKError):
     """The rest SageIntacctSDK errors, 500 error."""
+
+
+class ThrottledError(SageIntacctSDKError):
+    """Too many requests or service unavailable, 429 / 503 error."""
@@ -0,0 +1,136 @@
+"""
+Local ledger of the records posted to Intacct, used to resume interrupted runs
+"""
+import hashlib
+import json
+import os
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import singer
+
+logger = singer.get_logger()
+
+
+def record_keys(functions: Iterable[Dict], *namespace: str) -> List[str]:
+    """Keys identifying write functions by their content within a namespace.
+
+    Identical functions are told apart by their occurrence, so the second of two
+    identical rows is still posted when only the first one was.
+    """
+    prefix = json.dumps(list(namespace))
+    occurrences = Counter()
+    keys = []
+    for function in functions:
+        content = json.dumps(function, sort_keys=True, default=str)
+        digest = hashlib.sha256(f"{prefix}{content}".encode("utf-8")).hexdigest()
+        occurrences[digest] += 1
+        keys.append(f"{digest}-{occurrences[digest]}")
+    return keys
+
+
+class PostingLedger:
+    """Append-only file of the record keys posted to Intacct and their RECORDNOs.
+
+    Every line holds one posted record as JSON. Lines are written and synced after
+    each request, so a run that fails part way leaves the records it posted in the
+    ledger and the next run only sends the remainder. The records of an upload that
+    completed are removed, so the ledger never keeps a record that a later upload of
+    the same content should post again.
+
+    The ledger also keeps the id of the run posting an upload, so a run resuming the
+    upload sends its requests with the control ids of the interrupted one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.run_id = uuid.uuid4().hex
+        self._run_id_written = False
+        self._recordnos: Dict[str, Optional[str]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as ledger_file:
+                for line in ledger_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by an interrupted run
+                        logger.warning(f"Ignoring unreadable line of posting ledger {self.path}")
+                        continue
+                    if "run_id" in entry:
+                        self.run_id = entry["run_id"]
+                        self._run_id_written = True
+                        continue
+                    self._recordnos[entry["key"]] = entry.get("recordno")
+        except FileNotFoundError:
+            return
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._recordnos
+
+    def __len__(self) -> int:
+        return len(self._recordnos)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the RECORDNO of a posted record, None if it is unknown or was not returned."""
+        return self._recordnos.get(key)
+
+    def add(self, recordnos: Dict[str, Optional[str]]) -> None:
+        """Record posted records, keyed by record key with their RECORDNO."""
+        if not recordnos:
+            return
+        self.begin_run()
+        with open(self.path, "a", encoding="utf-8") as ledger_file:
+            for key, recordno in recordnos.items():
+                ledger_file.write(json.dumps({"key": key, "recordno": recordno}) + "\n")
+            ledger_file.flush()
+            os.fsync(ledger_file.fileno())
+        self._recordnos.update(recordnos)
+
+    def begin_run(self) -> str:
+        """Return the run id, written to the ledger before the first request of the run is sent."""
+        if not self._run_id_written:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as ledger_file:
+                ledger_file.write(json.dumps({"run_id": self.run_id}) + "\n")
+                ledger_file.flush()
+                os.fsync(ledger_file.fileno())
+            self._run_id_written = True
+        return self.run_id
+
+    def new_run(self) -> None:
+        """Start a new run id, once every request of the current one was answered."""
+        self.run_id = uuid.uuid4().hex
+        self._run_id_written = False
+        if self._recordnos:
+            self._rewrite()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def remove(self, keys: Iterable[str]) -> None:
+        """Forget posted records, rewriting the file without them."""
+        keys = set(keys) & self._recordnos.keys()
+        if not keys:
+            return
+        for key in keys:
+            del self._recordnos[key]
+        if not self._recordnos:
+            os.remove(self.path)
+            self._run_id_written = False
+            return
+        self._rewrite()
+
+    def _rewrite(self) -> None:
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as ledger_file:
+            ledger_file.write(json.dumps({"run_id": self.run_id}) + "\n")
+            for key, recordno in self._recordnos.items():
+                ledger_file.write(json.dumps({"key": key, "recordno": recordno}) + "\n")
+            ledger_file.flush()
+            os.fsync(ledger_file.fileno())
+        os.replace(temporary_path, self.path)
+        self._run_id_written = True
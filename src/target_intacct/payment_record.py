@@ -1,7 +1,11 @@
 import pandas as pd
 import singer
 
-from .utils import get_input
+from .dry_run import DryRunSDK
+from .reference import load_reference_index, normalize_key
+from .state import StateCheckpoints
+from .timing import timings
+from .utils import get_input, raise_failed_results
 
 from .const import PAYMENT_RECORDS_REQUIRED_COLS, PAYMENT_RECORDS_REQUIRED_CONFIG_KEYS
 
@@ -37,78 +41,91 @@ def verify_config_values(intacct_client, config):
         raise Exception(f"Config File is Missing Required config value, Found={config_keys} Required={PAYMENT_RECORDS_REQUIRED_CONFIG_KEYS}")
     
     # Get ids from Intacct to verify values in the config file
-    location_ids = intacct_client.get_entity(object_type="locations", fields=["LOCATIONID"])
-    department_ids = intacct_client.get_entity(object_type="departments", fields=["DEPARTMENTID"])
-    vendor_ids = intacct_client.get_entity(object_type="vendors", fields=["VENDORID"])
-    account_ids = intacct_client.get_entity(object_type="general_ledger_accounts", fields=["ACCOUNTNO"])
-    bank_account_ids = intacct_client.get_entity(object_type="checking_accounts", fields=["BANKACCOUNTID"])
-    project_ids = intacct_client.get_entity(object_type="projects", fields=["PROJECTID"])
-    customer_ids = intacct_client.get_entity(object_type="customers", fields=["CUSTOMERID"])
-    class_ids = intacct_client.get_entity(object_type="classes", fields=["CLASSID"])
-
-    for name, ids_list in {"locationid": location_ids, "departmentid": department_ids, "vendorid": vendor_ids, "bankaccountid": bank_account_ids, "projectid": project_ids, "customerid": customer_ids, "classid": class_ids}.items():
-        config_value = config[name]       
-        if not any(pair[name.upper()] == config_value for pair in ids_list):
-                raise Exception(
+    config_objects = {
+        "locationid": "locations",
+        "departmentid": "departments",
+        "vendorid": "vendors",
+        "bankaccountid": "checking_accounts",
+        "projectid": "projects",
+        "customerid": "customers",
+        "classid": "classes",
+    }
+    object_fields = {object_type: [name.upper()] for name, object_type in config_objects.items()}
+    object_fields["general_ledger_accounts"] = ["ACCOUNTNO"]
+    reference_index = load_reference_index(intacct_client, object_fields)
+
+    for name, object_type in config_objects.items():
+        config_value = config[name]
+        if normalize_key(config_value) not in reference_index.values(object_type, name.upper()):
+            raise Exception(
                 f"Field {name} with the value {config_value} is missing in Intacct"
-        )        
+            )
 
     # Checks all of the account numbers in the config against the account numbers in Intacct
+    account_ids = {
+        int(account_no)
+        for account_no in reference_index.values("general_ledger_accounts", "ACCOUNTNO")
+    }
     account_numbers = [value for key, value in config.items() if key.startswith('accountno')]
     for account_no in account_numbers:
-        if not any(int(pair["ACCOUNTNO"]) == account_no for pair in account_ids):
+        if account_no not in account_ids:
             raise Exception(
                 f"Field glaccountid with the value {account_no} is missing in Intacct"
-        )        
+            )
 
-def payment_record_upload(intacct_client, config) -> None:
-    """Creates payment records in Intacct.
 
-    Retrieves objects from Intacct API for verifying input data
-    Retrieves required data from input
-    Sends entries for uploading to Intacct
-    """
+def numeric_column(data_frame, column, dtype):
+    """Convert a column to numbers, with missing values as 0"""
+    return pd.to_numeric(data_frame[column]).fillna(0).astype(float).astype(dtype).to_numpy()
 
-    logger.info("Starting upload.")
-    
-    # Verify config data
-    verify_config_values(intacct_client, config)
 
-    # Get input from pipeline
-    input_value = get_input()
-    
-    if not input_value or not isinstance(input_value, list):
-        logger.info(f"No input data or invalid input data recieved. Input data={input_value}")
-        return 
-    
-    # Convert input from dictionary to DataFrame
-    data_frame = pd.DataFrame(input_value[0])
+def payout_rows(data_frame):
+    """Returns the indexes of the payout summaries with valid dates and a non zero amount, in order."""
+    payout_amounts = numeric_column(data_frame, "payout_amount", float)
+    years = numeric_column(data_frame, "year", int)
+    months = numeric_column(data_frame, "month", int)
+    days = numeric_column(data_frame, "day", int)
 
-    # Verify it has required columns
-    cols = set(data_frame.columns)
-    
-    if not PAYMENT_RECORDS_REQUIRED_COLS.issubset(cols):
-        raise Exception(
-            f"Input is missing REQUIRED_COLS. Found={cols}, Required={PAYMENT_RECORDS_REQUIRED_COLS}"
-        )
-    
-    # Process each payout summary
-    for _, payout in data_frame.iterrows():
-        payout_amount = float(payout["payout_amount"]) if payout["payout_amount"] is not None else 0
-        gross_amount = float(payout["gross_amount"]) if payout["gross_amount"] is not None else 0
-        total_fees = float(payout["total_fees"]) if payout["total_fees"] is not None else 0
-        total_sales_tax = float(payout["total_sales_tax"]) if payout["total_sales_tax"] is not None else 0
-        
-        # Get date components from pre-calculated values and convert to int
-        year = int(float(payout["year"])) if payout["year"] is not None else 0
-        month = int(float(payout["month"])) if payout["month"] is not None else 0
-        day = int(float(payout["day"])) if payout["day"] is not None else 0
-        
-        # Validate date values
-        if year == 0 or month == 0 or day == 0:
-            logger.warning(f"Skipping record with invalid date components: year={year}, month={month}, day={day}")
-            continue
-        
+    # Validate date values
+    invalid_dates = (years == 0) | (months == 0) | (days == 0)
+    zero_amounts = ~invalid_dates & (payout_amounts == 0)
+    if invalid_dates.any():
+        logger.warning(f"Skipping {int(invalid_dates.sum())} records with invalid date components")
+    if zero_amounts.any():
+        logger.info(f"Skipping {int(zero_amounts.sum())} records with an amount of $0")
+
+    return (~invalid_dates & ~zero_amounts).nonzero()[0]
+
+
+def build_payment_functions(data_frame, config, rows=None):
+    """Builds the other receipt and manual payment functions of the payout summaries.
+
+    Amounts, dates and the routing of each payout are computed column-wise; only the
+    request payloads are built row by row. One function is built for each of rows,
+    the payout_rows of the data frame by default.
+    """
+    if rows is None:
+        rows = payout_rows(data_frame)
+    payout_amounts = numeric_column(data_frame, "payout_amount", float)
+    gross_amounts = numeric_column(data_frame, "gross_amount", float)
+    total_fees = numeric_column(data_frame, "total_fees", float)
+    total_sales_taxes = numeric_column(data_frame, "total_sales_tax", float)
+
+    # Get date components from pre-calculated values and convert to int
+    years = numeric_column(data_frame, "year", int)
+    months = numeric_column(data_frame, "month", int)
+    days = numeric_column(data_frame, "day", int)
+
+    functions = []
+    for payout_amount, gross_amount, total_fee, total_sales_tax, year, month, day in zip(
+        payout_amounts[rows].tolist(),
+        gross_amounts[rows].tolist(),
+        total_fees[rows].tolist(),
+        total_sales_taxes[rows].tolist(),
+        years[rows].tolist(),
+        months[rows].tolist(),
+        days[rows].tolist(),
+    ):
         # If payout was negative (more was refunded/in fees than profit made) send to manual payments, otherwise send data to other receipts
         if payout_amount > 0:
             # The key order in this dictionary in required for the Intacct API call to work correctly
@@ -120,9 +137,9 @@ def payment_record_upload(intacct_client, config) -> None:
                     "bankaccountid": config["bankaccountid"], # ENV var
                     "depositdate": get_date_lines(year, month, day),
                     "description": config["description"],
-                    "receiptitems": {"lineitem": build_line_items(gross_amount, total_fees, total_sales_tax, config)}}
-            intacct_client.post_other_receipt(data)
-        elif payout_amount < 0:
+                    "receiptitems": {"lineitem": build_line_items(gross_amount, total_fee, total_sales_tax, config)}}
+            functions.append({"record_otherreceipt": data})
+        else:
             # The key order in this dictionary in required for the Intacct API call to work correctly
             data = {
                     "bankaccountid": config["bankaccountid"],
@@ -132,7 +149,64 @@ def payment_record_upload(intacct_client, config) -> None:
                     "checkdate": get_date_lines(year, month, day),
                     "checkno": config["checkno"],
                     "billno": f"{year}{month:02}{day:02}", # billno is is equal to the date of the payment
-                    "payitems": {"payitem": {"glaccountno": config["accountno_1"], "paymentamount": abs(payout_amount), "item1099": config["item1099"], "departmentid": config["departmentid"], "locationid": config["locationid"], "projectid": config["projectid"], "customerid": config["customerid"], "classid": config["classid"]}}}           
-            intacct_client.post_manual_payment(data)
-        else:
-            logger.info(f"Skipping record with an amount of $0")
\ No newline at end of file
+                    "payitems": {"payitem": {"glaccountno": config["accountno_1"], "paymentamount": abs(payout_amount), "item1099": config["item1099"], "departmentid": config["departmentid"], "locationid": config["locationid"], "projectid": config["projectid"], "customerid": config["customerid"], "classid": config["classid"]}}}
+            functions.append({"create_appayment": data})
+
+    logger.info(
+        f"Built {len(functions)} payment records from {len(data_frame)} payout summaries"
+    )
+    return functions
+
+
+def payment_record_upload(intacct_client, config) -> None:
+    """Creates payment records in Intacct.
+
+    Retrieves objects from Intacct API for verifying input data
+    Retrieves required data from input
+    Sends entries for uploading to Intacct
+    Writes the tap's STATE messages once the records read before them are posted
+    """
+
+    logger.info("Starting upload.")
+    checkpoints = StateCheckpoints(emit=not isinstance(intacct_client, DryRunSDK))
+    
+    # Verify config data
+    with timings.stage("load_reference"):
+        verify_config_values(intacct_client, config)
+
+    # Get input from pipeline
+    with timings.stage("read_input"):
+        input_value = get_input(states=checkpoints)
+
+        if not input_value or not isinstance(input_value, list):
+            logger.info(f"No input data or invalid input data recieved. Input data={input_value}")
+            checkpoints.posted()
+            return
+
+        # Convert input from dictionary to DataFrame
+        stream = input_value[0]["stream"]
+        data_frame = pd.DataFrame(input_value[0], copy=False)
+    timings.add("read_input", records=len(data_frame))
+
+    # Verify it has required columns
+    cols = set(data_frame.columns)
+    
+    if not PAYMENT_RECORDS_REQUIRED_COLS.issubset(cols):
+        raise Exception(
+            f"Input is missing REQUIRED_COLS. Found={cols}, Required={PAYMENT_RECORDS_REQUIRED_COLS}"
+        )
+    
+    with timings.stage("build", len(data_frame)) as stage:
+        rows = payout_rows(data_frame)
+        functions = build_payment_functions(data_frame, config, rows)
+        stage.records_out = len(functions)
+
+    def on_posted(count):
+        # Skipped rows count as posted once the functions before them are
+        checkpoints.posted(stream, int(rows[count]) if count < len(rows) else len(data_frame))
+
+    with timings.stage("post", len(functions)) as stage:
+        results = intacct_client.post_batch(functions, endpoint="payment_record", on_posted=on_posted)
+        stage.records_out = sum(result["status"] != "failure" for result in results)
+    raise_failed_results(functions, results, "payment records")
+    checkpoints.posted(stream)
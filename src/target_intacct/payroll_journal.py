@@ -6,7 +6,12 @@ import pandas as pd
 
 import singer
 
-from .utils import get_input, set_journal_entry_value
+from .const import JOURNAL_ENTRY_FIELD_NAMES, PAYROLL_JOURNAL_COLUMNS
+from .dry_run import DryRunSDK
+from .reference import load_reference_index_for_values
+from .state import StateCheckpoints
+from .timing import timings
+from .utils import get_input, validate_columns
 
 logger = singer.get_logger()
 
@@ -14,26 +19,36 @@ logger = singer.get_logger()
 def journal_upload(intacct_client, object_name) -> None:
     """Uploads Financial Journals to Intacct.
 
-    Retrieves objects from Intacct API for verifying input data
+    Looks up the input's dimension values in Intacct API for verifying input data
     Calls load_entries method
     Sends entries for uploading to Intacct
+    Writes the tap's STATE messages once every entry is posted
     """
     logger.info("Starting upload.")
+    checkpoints = StateCheckpoints(emit=not isinstance(intacct_client, DryRunSDK))
 
-    # Load Active Classes, Customers, Accounts
-    account_ids = intacct_client.get_entity(
-        object_type="general_ledger_accounts", fields=["ACCOUNTNO"]
-    )
-    class_ids = intacct_client.get_entity(object_type="classes", fields=["CLASSID"])
-    location_ids = intacct_client.get_entity(
-        object_type="locations", fields=["LOCATIONID"]
-    )
-    department_ids = intacct_client.get_entity(
-        object_type="departments", fields=["DEPARTMENTID"]
-    )
+    # Get input from pipeline
+    with timings.stage("read_input"):
+        data_frame = pd.DataFrame(get_input(states=checkpoints))
+    timings.add("read_input", records=len(data_frame))
+
+    # Look up the input's Accounts, Classes, Locations and Departments in Intacct
+    with timings.stage("load_reference"):
+        reference_index = load_reference_index_for_values(
+            intacct_client,
+            {
+                object_type: (field, data_frame[column] if column in data_frame.columns else [])
+                for column, (object_type, field) in PAYROLL_JOURNAL_COLUMNS.items()
+            },
+        )
+    account_ids = reference_index.values("general_ledger_accounts", "ACCOUNTNO")
+    class_ids = reference_index.values("classes", "CLASSID")
+    location_ids = reference_index.values("locations", "LOCATIONID")
+    department_ids = reference_index.values("departments", "DEPARTMENTID")
 
     # Load Journal Entries CSV to post + Convert to Intacct format
     journal_entries = load_journal_entries(
+        data_frame,
         account_ids,
         class_ids,
         location_ids,
@@ -42,13 +57,17 @@ def journal_upload(intacct_client, object_name) -> None:
     )
 
     # Post the journal entries to Intacct
-    for je in journal_entries:
-        intacct_client.post_journal(je)
+    with timings.stage("post", len(data_frame)) as stage:
+        for je in journal_entries:
+            intacct_client.post_journal(je)
+        stage.records_out = sum(len(je["ENTRIES"]["GLENTRY"]) for je in journal_entries)
+    checkpoints.posted()
 
     logger.info("Upload completed")
 
 
 def load_journal_entries(
+    data_frame,
     account_ids,
     class_ids,
     location_ids,
@@ -57,11 +76,6 @@ def load_journal_entries(
 ):
     """Loads inputted data into Financial Journal Entries."""
 
-    # Get input from pipeline
-    input_value = get_input()
-
-    # Convert input from dictionary to DataFrame
-    data_frame = pd.DataFrame(input_value)
     # Verify it has required columns
     cols = list(data_frame.columns)
     REQUIRED_COLS = {
@@ -78,21 +92,30 @@ def load_journal_entries(
             f"Input is missing REQUIRED_COLS. Found={json.dumps(cols)}, Required={json.dumps(REQUIRED_COLS)}"
         )
 
-    journal_entries = []
-    errored = False
+    # Report every value missing in Intacct at once, before building
+    with timings.stage("validate", len(data_frame)):
+        validate_columns(
+            data_frame,
+            {
+                "AccountNumber": ("ACCOUNTNO", account_ids),
+                "BusinessUnit": ("CLASSID", class_ids),
+                "locationid": ("LOCATIONID", location_ids),
+                "PracticeAreaID": ("DEPARTMENTID", department_ids),
+            },
+            object_name,
+        )
 
     # Build the entries
-    journal_entries, errored = build_lines(
-        data_frame,
-        account_ids,
-        class_ids,
-        location_ids,
-        department_ids,
-        object_name,
-    )
-
-    if errored:
-        raise Exception("Building Payroll Journal Entries failed!")
+    with timings.stage("build", len(data_frame)) as stage:
+        journal_entries = build_lines(
+            data_frame,
+            account_ids,
+            class_ids,
+            location_ids,
+            department_ids,
+            object_name,
+        )
+        stage.records_out = sum(len(entry["ENTRIES"]["GLENTRY"]) for entry in journal_entries)
 
     # Print journal entries
     logger.info(f"Loaded {len(journal_entries)} journal entries to post")
@@ -108,17 +131,23 @@ def build_lines(
     department_ids,
     object_name,
 ):
+    """Builds the payroll journal entry from the input DataFrame.
+
+    The account, class, location and department values are expected to be validated
+    already, as load_journal_entries does before building.
+    """
     logger.info(f"Converting {object_name}...")
     line_items = []
     journal_entries = []
-    errored = False
+
+    # Journal entry line field of each input column referencing Intacct
+    line_fields = {
+        column: JOURNAL_ENTRY_FIELD_NAMES[field]
+        for column, (_, field) in PAYROLL_JOURNAL_COLUMNS.items()
+    }
 
     # Create line items
     for index, row in data.iterrows():
-        account_id = row["AccountNumber"]
-        class_id = row["BusinessUnit"]
-        location_id = row["locationid"]
-        department_id = row["PracticeAreaID"]
         currency = row["Currency"]
         description = row["Description"]
         amount = row["amount"]
@@ -134,21 +163,8 @@ def build_lines(
             "EXCH_RATE_TYPE_ID": exchange_rate,
         }
 
-        entry_error = False
-        for lst, field, to_search in [
-            (account_ids, "ACCOUNTNO", account_id),
-            (class_ids, "CLASSID", class_id),
-            (location_ids, "LOCATIONID", location_id),
-            (department_ids, "DEPARTMENTID", department_id),
-        ]:
-            entry_error = set_journal_entry_value(
-                je_detail, lst, field, to_search, object_name
-            )
-            if entry_error:
-                break
-
-        if entry_error:
-            errored = True
+        for column, je_field_name in line_fields.items():
+            je_detail[je_field_name] = row[column]
 
         # Create the line item
         line_items.append(je_detail)
@@ -164,4 +180,4 @@ def build_lines(
 
     journal_entries.append(entry)
 
-    return journal_entries, errored
+    return journal_entries
@@ -0,0 +1,47 @@
+"""
+Bounded concurrency posting of independent requests to Intacct
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+
+def post_concurrently(
+    post: Callable[[Item], Result],
+    items: Iterable[Item],
+    max_workers: int,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Result]:
+    """Call post for every item on a pool of max_workers threads.
+
+    At most max_in_flight items are submitted ahead of the oldest unfinished one, so
+    items are consumed lazily, and results are yielded in the order of items. An
+    exception raised by post is raised when its result is reached.
+
+    The posts share the client's rate limiter, so the pool only overlaps round trips.
+    """
+    max_workers = max(1, int(max_workers))
+    max_in_flight = max(max_workers, int(max_in_flight or 2 * max_workers))
+
+    if max_workers == 1:
+        for item in items:
+            yield post(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        try:
+            for item in items:
+                if len(in_flight) >= max_in_flight:
+                    yield in_flight.popleft().result()
+                in_flight.append(executor.submit(post, item))
+
+            while in_flight:
+                yield in_flight.popleft().result()
+        finally:
+            # Stop posting queued items when the caller stops or a post failed
+            for future in in_flight:
+                future.cancel()
@@ -0,0 +1,116 @@
+"""
+Adaptive request rate limiting shared by every client of a company
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+import singer
+from singer.metrics import Point
+
+from .const import (
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_RATE_LIMIT_INCREASE,
+    DEFAULT_RATE_LIMIT_MIN,
+    DEFAULT_SLOW_RESPONSE_SECONDS,
+)
+
+logger = singer.get_logger()
+
+
+class RateLimiter:
+    """Token bucket limiting the requests per second sent to Intacct.
+
+    The rate adapts with AIMD: it is halved when Intacct throttles or responds slower
+    than slow_response_seconds, and grows by increase requests per second for every
+    healthy response, up to max_rate. Tokens are reserved under a lock and waited for
+    outside of it, so the limiter can be shared by threads and asyncio tasks.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE_LIMIT,
+        min_rate: float = DEFAULT_RATE_LIMIT_MIN,
+        max_rate: Optional[float] = None,
+        increase: float = DEFAULT_RATE_LIMIT_INCREASE,
+        decrease: float = 0.5,
+        slow_response_seconds: float = DEFAULT_SLOW_RESPONSE_SECONDS,
+        name: str = "",
+    ):
+        self.max_rate = float(max_rate if max_rate is not None else rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_response_seconds = slow_response_seconds
+        self.name = name
+        self._rate = min(max(float(rate), self.min_rate), self.max_rate)
+        self._tokens = 1.0
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Current number of requests allowed per second."""
+        return self._rate
+
+    def _reserve(self) -> float:
+        """Take a token and return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            # The bucket holds at most one second of requests
+            self._tokens = min(
+                max(self._rate, 1.0), self._tokens + (now - self._updated_at) * self._rate
+            )
+            self._updated_at = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Wait, without blocking the event loop, until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_response(self, elapsed: float) -> None:
+        """Adjust the rate after a response that was not throttled."""
+        if elapsed > self.slow_response_seconds:
+            self.on_throttle()
+        else:
+            self._set_rate(self._rate + self.increase)
+
+    def on_throttle(self) -> None:
+        """Back off after Intacct throttled a request or was slow to answer."""
+        self._set_rate(self._rate * self.decrease)
+
+    def _set_rate(self, rate: float) -> None:
+        with self._lock:
+            previous_rate = self._rate
+            self._rate = min(max(rate, self.min_rate), self.max_rate)
+            changed = self._rate != previous_rate
+            backed_off = self._rate < previous_rate
+        # Report every back off, and increases only once a whole request per second is regained
+        if changed and (backed_off or int(self._rate) != int(previous_rate)):
+            singer.metrics.log(
+                logger, Point("gauge", "rate_limit", round(self._rate, 3), {"limiter": self.name})
+            )
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(company_id: str, **kwargs) -> RateLimiter:
+    """Return the rate limiter of a company, creating it with kwargs on first use."""
+    with _rate_limiters_lock:
+        if company_id not in _rate_limiters:
+            _rate_limiters[company_id] = RateLimiter(name=company_id, **kwargs)
+        return _rate_limiters[company_id]
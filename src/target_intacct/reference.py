@@ -0,0 +1,166 @@
+"""
+Reference data indexes used to validate input values against Intacct
+"""
+import threading
+from collections.abc import Set
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+
+def normalize_key(value) -> str:
+    """Normalize a value to the string form Intacct returns for ids.
+
+    Whole floats (e.g. 1200.0 read from a numeric column) are compared as integers.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class ReferenceValues(Set):
+    """Known values of one field of an object type.
+
+    A value that is not found triggers a single refresh of a refreshable object type
+    from Intacct, so values created since the reference data was cached still validate.
+    """
+
+    def __init__(self, index: "ReferenceIndex", object_type: str, field: str):
+        self._index = index
+        self._object_type = object_type
+        self._field = field
+
+    @classmethod
+    def _from_iterable(cls, iterable) -> FrozenSet[str]:
+        # Results of set operations are plain sets
+        return frozenset(iterable)
+
+    @property
+    def _values(self) -> FrozenSet[str]:
+        return self._index._values[self._object_type][self._field]
+
+    def __contains__(self, value) -> bool:
+        if value in self._values:
+            return True
+        if self._index.refresh(self._object_type):
+            return value in self._values
+        return False
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class ReferenceIndex:
+    """Set based lookup of Intacct values, indexed per object type and per field.
+
+    Built once per run from the lists returned by get_entity so input validation
+    is a constant time membership check instead of a scan of the tenant data.
+    """
+
+    def __init__(
+        self,
+        loader: Optional[Callable[[str, List[str]], List[Dict]]] = None,
+        refreshable: Optional[Iterable[str]] = None,
+    ):
+        """
+        :param loader: Optional callable downloading fresh objects for (object_type, fields),
+            used to refresh an object type once when a value is missing
+        :param refreshable: Optional object types the loader refreshes, all of them by default
+        """
+        self._values: Dict[str, Dict[str, FrozenSet[str]]] = {}
+        self._loader = loader
+        self._refreshable = None if refreshable is None else frozenset(refreshable)
+        self._refreshed = set()
+        self._lock = threading.Lock()
+
+    def add(self, object_type: str, fields: List[str], intacct_objects: Iterable[Dict]) -> None:
+        """Index the given fields of a list of Intacct objects."""
+        self.add_rows(
+            object_type, fields, (tuple(o.get(field) for field in fields) for o in intacct_objects)
+        )
+
+    def add_rows(self, object_type: str, fields: List[str], rows: Iterable[Tuple]) -> None:
+        """Index rows of field values in the order of fields, e.g. as yielded by iter_entity.
+
+        Rows are consumed once, so an iterator is indexed without being held in memory.
+        """
+        field_values = [set() for _ in fields]
+        for row in rows:
+            for values, value in zip(field_values, row):
+                if value is not None:
+                    values.add(normalize_key(value))
+        by_field = self._values.setdefault(object_type, {})
+        for field, values in zip(fields, field_values):
+            by_field[field] = frozenset(values)
+
+    def values(self, object_type: str, field: str) -> ReferenceValues:
+        """Return the indexed values of a field for an object type."""
+        try:
+            self._values[object_type][field]
+        except KeyError:
+            raise KeyError(f"{object_type}.{field} has not been loaded into the reference index")
+        return ReferenceValues(self, object_type, field)
+
+    def refresh(self, object_type: str) -> bool:
+        """Reload an object type from Intacct, at most once per run.
+
+        Returns:
+            True if the object type was reloaded by this call.
+        """
+        if self._loader is None:
+            return False
+        if self._refreshable is not None and object_type not in self._refreshable:
+            return False
+        with self._lock:
+            if object_type in self._refreshed:
+                return False
+            self._refreshed.add(object_type)
+            fields = list(self._values[object_type])
+            self.add(object_type, fields, self._loader(object_type, fields))
+        return True
+
+    def __contains__(self, object_type: str) -> bool:
+        return object_type in self._values
+
+
+def _refresh_loader(intacct_client):
+    """Return the loader refreshing an object type from Intacct, if the client caches reference data.
+
+    Values missing from cached data then refresh their object type before they are reported.
+    """
+    if not getattr(intacct_client, "reference_cache", None):
+        return None
+
+    def loader(object_type, fields):
+        return intacct_client.get_entities({object_type: fields}, refresh=True)[object_type]
+
+    return loader
+
+
+def load_reference_index(intacct_client, object_fields: Dict[str, List[str]]) -> ReferenceIndex:
+    """Load the given object types in bulk and index the given fields of each."""
+    reference_index = ReferenceIndex(_refresh_loader(intacct_client))
+    for object_type, intacct_objects in intacct_client.get_entities(object_fields).items():
+        reference_index.add(object_type, object_fields[object_type], intacct_objects)
+    return reference_index
+
+
+def load_reference_index_for_values(
+    intacct_client, object_values: Dict[str, Tuple[str, Iterable]]
+) -> ReferenceIndex:
+    """Index which of the given input values exist in Intacct.
+
+    Only the object types whose values were served from the reference cache are
+    refreshed when a value is missing, the others were just looked up in Intacct.
+
+    Parameters:
+        object_values (dict): Field and input values to look up, keyed by object type.
+    """
+    cached = set()
+    values_found = intacct_client.get_existing_values(object_values, cached)
+    reference_index = ReferenceIndex(_refresh_loader(intacct_client), cached)
+    for object_type, existing_values in values_found.items():
+        field = object_values[object_type][0]
+        reference_index.add(object_type, [field], ({field: value} for value in existing_values))
+    return reference_index
@@ -0,0 +1,114 @@
+"""
+Incremental parsing of query page responses into rows of field values
+"""
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from xml.parsers import expat
+
+from .exceptions import SageIntacctSDKError
+
+CONTROL_STATUS = ("response", "control", "status")
+AUTHENTICATION_STATUS = ("response", "operation", "authentication", "status")
+RESULT_STATUS = ("response", "operation", "result", "status")
+RESULT_DATA = ("response", "operation", "result", "data")
+
+
+class EntityPage(NamedTuple):
+    """Rows of one query page, with the counts Intacct reports for the query."""
+
+    rows: List[Tuple]
+    total_count: int
+    num_remaining: int
+
+
+class EntityPageParser:
+    """Parses the response to a query page as it is received.
+
+    Only the status elements and the selected fields of each object are kept, so a
+    page is never held as a tree and each row is a tuple in the order of fields. The
+    body of an unsuccessful response, which has no data element, is kept so it can go
+    through the regular response checks.
+    """
+
+    def __init__(self, intacct_object_type: str, fields: List[str]):
+        self.intacct_object_type = intacct_object_type
+        self.fields = list(fields)
+        self._field_positions = {field: position for position, field in enumerate(self.fields)}
+
+    def parse(self, chunks: Iterable[bytes]) -> Tuple[Optional[EntityPage], Optional[bytes]]:
+        """Parse the chunks of a response body.
+
+        Returns:
+            The page and None if the query succeeded, otherwise None and the body.
+        """
+        path = []
+        statuses = {}
+        counts = {}
+        rows = []
+        body_chunks = []
+        row = None
+        text = None
+        position = None
+        field_positions = self._field_positions
+        intacct_object_type = self.intacct_object_type
+
+        def start_element(name, attributes):
+            nonlocal body_chunks, row, text, position
+            path.append(name)
+            depth = len(path)
+            if depth == 6 and row is not None:
+                position = field_positions.get(name)
+                text = [] if position is not None else None
+            elif depth == 5 and name == intacct_object_type and counts:
+                row = [None] * len(field_positions)
+            elif depth in (3, 4) and name == "status":
+                text = []
+            elif depth == 4 and tuple(path) == RESULT_DATA:
+                counts["total_count"] = int(attributes.get("totalcount", 0))
+                counts["num_remaining"] = int(attributes.get("numremaining", 0))
+                # The statuses are known, the rest of the body is only needed on failure
+                if statuses.get(RESULT_STATUS) == "success":
+                    body_chunks = None
+
+        def end_element(name):
+            nonlocal row, text, position
+            depth = len(path)
+            if text is not None:
+                value = "".join(text).strip() or None
+                if depth == 6:
+                    row[position] = value
+                else:
+                    statuses[tuple(path)] = value
+                text = None
+                position = None
+            elif depth == 5 and row is not None:
+                rows.append(tuple(row))
+                row = None
+            path.pop()
+
+        def character_data(data):
+            if text is not None:
+                text.append(data)
+
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = start_element
+        parser.EndElementHandler = end_element
+        parser.CharacterDataHandler = character_data
+
+        for chunk in chunks:
+            if body_chunks is not None:
+                body_chunks.append(chunk)
+            parser.Parse(chunk, False)
+        parser.Parse(b"", True)
+
+        if counts and all(
+            statuses.get(status) == "success"
+            for status in (CONTROL_STATUS, AUTHENTICATION_STATUS, RESULT_STATUS)
+        ):
+            return EntityPage(rows, counts["total_count"], counts["num_remaining"]), None
+
+        if body_chunks is None:
+            raise SageIntacctSDKError(
+                f"Unexpected response to the {intacct_object_type} query: {statuses}"
+            )
+        return None, b"".join(body_chunks)
@@ -0,0 +1,50 @@
+"""
+The tap's STATE messages, passed on once the records read before them are posted to Intacct
+"""
+from typing import Dict, List, Optional, Tuple
+
+import singer
+
+from .const import TARGET_STATE_KEY
+
+
+class StateCheckpoints:
+    """STATE messages of the tap with the number of records of each stream read before them.
+
+    A STATE is only written once every record read before it was posted, so the tap's
+    bookmarks never move past a record missing in Intacct. Only the latest STATE ready
+    is written, with the number of records posted per stream under TARGET_STATE_KEY.
+    """
+
+    def __init__(self, emit: bool = True):
+        """
+        :param emit: Whether the STATEs are written to stdout, dry runs post nothing and write none
+        """
+        self.emit = emit
+        self._states: List[Tuple[Dict[str, int], object]] = []
+
+    def add(self, records: Dict[str, int], value) -> None:
+        """Add a STATE read after the given number of records of each stream."""
+        self._states.append((dict(records), value))
+
+    def posted(self, stream: Optional[str] = None, records: Optional[int] = None) -> None:
+        """Write the latest STATE whose records are posted, once the first records of stream are.
+
+        Every STATE is ready when records is None, e.g. once a whole upload is posted,
+        and without a stream the records of every stream count as posted.
+        """
+        ready = 0
+        for records_read, _ in self._states:
+            if records is not None and records_read.get(stream, 0) > records:
+                break
+            ready += 1
+        if not ready:
+            return
+
+        records_read, value = self._states[ready - 1]
+        del self._states[:ready]
+        if isinstance(value, dict):
+            records_posted = records_read if stream is None else {stream: records_read.get(stream, 0)}
+            value = {**value, TARGET_STATE_KEY: {"records_posted": records_posted}}
+        if self.emit:
+            singer.write_state(value)
@@ -1,9 +1,16 @@
 from datetime import datetime
+
+import numpy as np
 import pandas as pd
 
 import singer
 
-from .utils import get_input, set_journal_entry_value
+from .const import JOURNAL_ENTRY_FIELD_NAMES, STATISTICAL_JOURNAL_DIMENSIONS
+from .dry_run import DryRunSDK
+from .reference import load_reference_index_for_values, normalize_key
+from .state import StateCheckpoints
+from .timing import timings
+from .utils import get_input, validate_columns
 
 logger = singer.get_logger()
 
@@ -11,78 +18,93 @@ logger = singer.get_logger()
 def statistical_journal_upload(intacct_client, object_name, batch_title) -> None:
     """Uploads Statistical Journals to Intacct.
 
-    Retrieves objects from Intacct API for verifying input data
+    Reads the input first so only the values its columns refer to are
+    looked up in Intacct API for verifying input data
     Calls load_entries method
-    Sends entries for uploading to Intacct
+    Sends entries for uploading to Intacct, split into batches when they are large
+    Writes the tap's STATE messages once every batch is posted
     """
 
     logger.info("Starting upload.")
-
-    # Load Current Data in Intacct for input verification
-    employee_ids = intacct_client.get_entity(
-        object_type="employees", fields=["EMPLOYEEID"]
-    )
-    class_ids = intacct_client.get_entity(object_type="classes", fields=["CLASSID"])
-    location_ids = intacct_client.get_entity(
-        object_type="locations", fields=["LOCATIONID"]
-    )
-    department_ids = intacct_client.get_entity(
-        object_type="departments", fields=["DEPARTMENTID"]
-    )
-    customer_ids = intacct_client.get_entity(
-        object_type="customers", fields=["CUSTOMERID"]
-    )
-    project_ids = intacct_client.get_entity(
-        object_type="projects", fields=["PROJECTID"]
-    )
-    item_ids = intacct_client.get_entity(object_type="items", fields=["ITEMID"])
-    vendor_ids = intacct_client.get_entity(object_type="vendors", fields=["VENDORID"])
-    statistical_account_numbers = intacct_client.get_entity(
-        object_type="statistical_accounts", fields=["ACCOUNTNO"]
+    checkpoints = StateCheckpoints(emit=not isinstance(intacct_client, DryRunSDK))
+
+    with timings.stage("read_input"):
+        data_frame = get_statistical_journal_input(checkpoints)
+    timings.add("read_input", records=len(data_frame))
+
+    # Look up the input's values in Intacct for input verification, for the dimensions found in the input.
+    # Dimensions keep their fixed order, which is the order of their fields in every GLENTRY
+    dimensions = {
+        column: object_field
+        for column, object_field in STATISTICAL_JOURNAL_DIMENSIONS.items()
+        if column in data_frame.columns
+    }
+    object_values = {
+        object_type: (field, data_frame[column])
+        for column, (object_type, field) in dimensions.items()
+    }
+    object_values["statistical_accounts"] = (
+        "ACCOUNTNO",
+        np.concatenate(
+            [
+                data_frame[column].to_numpy(dtype=object)
+                for column in data_frame.columns
+                if column.startswith("accountno")
+            ]
+            or [np.array([], dtype=object)]
+        ),
     )
+    logger.info(f"Looking up {', '.join(object_values)} in Intacct for input verification")
+    with timings.stage("load_reference"):
+        reference_index = load_reference_index_for_values(intacct_client, object_values)
 
     dimension_values = {
-        "employeeid": employee_ids,
-        "classid": class_ids,
-        "locationid": location_ids,
-        "departmentid": department_ids,
-        "customerid": customer_ids,
-        "projectid": project_ids,
-        "itemid": item_ids,
-        "vendorid": vendor_ids,
+        column: reference_index.values(object_type, field)
+        for column, (object_type, field) in dimensions.items()
     }
+    statistical_account_numbers = reference_index.values("statistical_accounts", "ACCOUNTNO")
 
     # Journal Entries to be uploaded
     journal_entries = load_statistical_journal_entries(
+        data_frame,
         dimension_values,
         statistical_account_numbers,
         object_name,
         batch_title,
     )
 
-    # Post the journal entries to Intacct
-    for entry in journal_entries:
-        intacct_client.post_journal(entry)
+    # Post the journal entries to Intacct, split into batches when they are large
+    with timings.stage("post", sum(len(entry["ENTRIES"]["GLENTRY"]) for entry in journal_entries)) as stage:
+        results = intacct_client.post_journals(journal_entries)
+        stage.records_out = sum(result["LINES"] for result in results if result["status"] == "success")
+    failed = [result for result in results if result["status"] == "failure"]
+    for result in failed:
+        logger.error(f"Failed to create journal batch {result['BATCH_TITLE']} in Intacct: {result['errormessage']}")
+    if failed:
+        rolled_back = sum(result["status"] == "rolled back" for result in results)
+        raise Exception(
+            f"{len(failed)} of {len(results)} {object_name} batches failed to upload to Intacct, "
+            f"{rolled_back} posted batches were rolled back"
+        )
+    checkpoints.posted()
 
     logger.info("Upload completed")
 
 
-def load_statistical_journal_entries(
-    dimension_values,
-    statistical_account_numbers,
-    object_name,
-    batch_title,
-):
-    """Loads inputted data into Statistical Journal Entries."""
+def get_statistical_journal_input(states=None):
+    """Reads the statistical journal input from the pipeline into a DataFrame.
+
+    The tap's STATE messages are added to states when given.
+    """
 
     # Get input from pipeline
-    input_value = get_input()
+    input_value = get_input(states=states)
 
     if not input_value or not isinstance(input_value, list):
         raise Exception(f"Invalid input data recieved. Input data={input_value}")
     
     # Convert input from dictionary to DataFrame
-    data_frame = pd.DataFrame(input_value[0])
+    data_frame = pd.DataFrame(input_value[0], copy=False)
 
     # Verify it has required columns
     cols = list(data_frame.columns)
@@ -93,57 +115,48 @@ def load_statistical_journal_entries(
             f"Input is missing REQUIRED_COLS. Found={cols}, Required={REQUIRED_COLS}"
         )
 
-    # Build the entries
-    journal_entries = build_lines(
-        data_frame,
-        dimension_values,
-        statistical_account_numbers,
-        object_name,
-        batch_title,
-    )
-
-    # Print journal entries
-    logger.info(f"Loaded {len(journal_entries)} journal entries to post")
-
-    return journal_entries
+    return data_frame
 
 
-def build_entry(
-    row,
+def load_statistical_journal_entries(
+    data_frame,
     dimension_values,
     statistical_account_numbers,
     object_name,
-    account_number_column,
+    batch_title,
 ):
-    account_no = row[account_number_column]
-    tr_type = row["tr_type"]
-
-    # Get corresponding amount for current account
-    try:
-        amount = row[account_number_column.replace("accountno", "amount")]
-    except KeyError:
-        raise Exception(
-            f"Statistical Account Number {account_no} is missing a corresponding amount"
-        )
+    """Loads inputted data into Statistical Journal Entries."""
 
-    # Create journal entry line detail
-    je_detail = {
-        "AMOUNT": str(round(amount, 2)),
-        "TR_TYPE": tr_type,
+    # Report every value missing in Intacct at once, before building
+    columns_to_validate = {
+        column: ("ACCOUNTNO", statistical_account_numbers)
+        for column in data_frame.columns
+        if column.startswith("accountno")
     }
-
-    set_journal_entry_value(
-        je_detail, statistical_account_numbers, "ACCOUNTNO", account_no, object_name
+    columns_to_validate.update(
+        {
+            column: (column.upper(), intacct_values)
+            for column, intacct_values in dimension_values.items()
+        }
     )
-    
-    for field_name, ids_list in dimension_values.items():
-        if field_name in row.index:
-            field = row[field_name]
-            set_journal_entry_value(
-                je_detail, ids_list, field_name.upper(), field, object_name
-            )
+    with timings.stage("validate", len(data_frame)):
+        validate_columns(data_frame, columns_to_validate, object_name)
+
+    # Build the entries
+    with timings.stage("build", len(data_frame)) as stage:
+        journal_entries = build_lines(
+            data_frame,
+            dimension_values,
+            statistical_account_numbers,
+            object_name,
+            batch_title,
+        )
+        stage.records_out = sum(len(entry["ENTRIES"]["GLENTRY"]) for entry in journal_entries)
 
-    return je_detail
+    # Print journal entries
+    logger.info(f"Loaded {len(journal_entries)} journal entries to post")
+
+    return journal_entries
 
 
 def build_lines(
@@ -153,8 +166,16 @@ def build_lines(
     object_name,
     batch_title,
 ):
+    """Builds the statistical journal entry from the input DataFrame.
+
+    The accountno/amount column pairs are reshaped from wide to long in one step,
+    giving one line per input row and account column, grouped by account column.
+    Amounts are rounded column-wise before the lines are emitted. The account and
+    dimension values are expected to be validated already, as
+    load_statistical_journal_entries does before building, and are written in the
+    string form Intacct returns for ids.
+    """
     logger.info(f"Converting {object_name}...")
-    line_items = []
     journal_entries = []
 
     # Create list of account data the journal will contain
@@ -162,31 +183,65 @@ def build_lines(
         column for column in data.columns if column.startswith("accountno")
     ]
 
-    if len(account_number_columns):
-        for account_number_column in account_number_columns:
-            for index, row in data.iterrows():
-                line_entry = build_entry(
-                    row,
-                    dimension_values,
-                    statistical_account_numbers,
-                    object_name,
-                    account_number_column,
-                )
-
-                line_items.append(line_entry)
-
-        # Create the entry
-        entry = {
-            "JOURNAL": row.get("Journal", "STJ"),
-            "BATCH_DATE": datetime.now().strftime("%m/%d/%Y"),
-            "BATCH_TITLE": batch_title,
-            "ENTRIES": {"GLENTRY": line_items},
-        }
-
-        journal_entries.append(entry)
-    else:
+    if not len(account_number_columns):
         raise Exception(
             "Missing Required accountno Column. At least one Account number is required to upload a journal"
         )
 
+    # Get corresponding amount column for each account column
+    amount_columns = []
+    for account_number_column in account_number_columns:
+        amount_column = account_number_column.replace("accountno", "amount")
+        if amount_column not in data.columns:
+            raise Exception(
+                f"Statistical Account Number {data[account_number_column].iloc[0]} is missing a corresponding amount"
+            )
+        amount_columns.append(amount_column)
+
+    # Reshape the account columns from wide to long
+    column_count = len(account_number_columns)
+    account_numbers = np.array(
+        [normalize_key(value) for column in account_number_columns for value in data[column].tolist()],
+        dtype=object,
+    )
+    # Rounded with Python's round on the column's own values, so 2.675 stays "2.67"
+    # and integer amounts are not turned into floats
+    amounts = np.array(
+        [
+            str(round(amount, 2))
+            for column in amount_columns
+            for amount in pd.to_numeric(data[column]).tolist()
+        ],
+        dtype=object,
+    )
+    line_columns = {
+        "AMOUNT": amounts,
+        "TR_TYPE": np.tile(data["tr_type"].to_numpy(dtype=object), column_count),
+        JOURNAL_ENTRY_FIELD_NAMES["ACCOUNTNO"]: account_numbers,
+    }
+
+    for field_name in dimension_values:
+        if field_name in data.columns:
+            field_values = np.array([normalize_key(value) for value in data[field_name].tolist()], dtype=object)
+            line_columns[JOURNAL_ENTRY_FIELD_NAMES[field_name.upper()]] = np.tile(
+                field_values, column_count
+            )
+
+    # Emit the journal entry lines from the long columns
+    line_keys = list(line_columns)
+    line_items = [
+        dict(zip(line_keys, values))
+        for values in zip(*(column.tolist() for column in line_columns.values()))
+    ]
+
+    # Create the entry
+    entry = {
+        "JOURNAL": data["Journal"].iloc[-1] if "Journal" in data.columns else "STJ",
+        "BATCH_DATE": datetime.now().strftime("%m/%d/%Y"),
+        "BATCH_TITLE": batch_title,
+        "ENTRIES": {"GLENTRY": line_items},
+    }
+
+    journal_entries.append(entry)
+
     return journal_entries
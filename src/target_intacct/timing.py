@@ -0,0 +1,294 @@
+"""
+Wall clock timings of the stages of a run and metrics of its requests to Intacct
+"""
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import singer
+from singer.metrics import Point
+
+from .const import DEFAULT_SLOW_REQUEST_SECONDS, REQUEST_LATENCY_BUCKETS, SLOW_REQUESTS_KEPT
+
+logger = singer.get_logger()
+
+
+class StageRun:
+    """A running stage, its records_out can be set once the stage produced them."""
+
+    def __init__(self):
+        self.records_out: Optional[int] = None
+
+
+class StageTimings:
+    """Accumulates the seconds spent in and the records handled by each stage of a run.
+
+    Stages are kept per object type when one is given, and are reported in the order
+    they first ran, with their throughput.
+    """
+
+    def __init__(self):
+        self._stages: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, records: Optional[int] = None, object_type: Optional[str] = None):
+        """Time the body of the with statement as part of a stage."""
+        run = StageRun()
+        started_at = time.perf_counter()
+        try:
+            yield run
+        finally:
+            self.add(name, time.perf_counter() - started_at, records, run.records_out, object_type)
+
+    def add(
+        self,
+        name: str,
+        seconds: float = 0.0,
+        records: Optional[int] = None,
+        records_out: Optional[int] = None,
+        object_type: Optional[str] = None,
+    ) -> None:
+        """Add seconds, records in and records out to a stage."""
+        with self._lock:
+            stage = self._stages.setdefault((name, object_type), [0.0, 0, 0])
+            stage[0] += seconds
+            stage[1] += records or 0
+            stage[2] += records_out or 0
+
+    def report(self) -> List[Dict]:
+        """Return the name, object type, seconds, records in and out and records per second of every stage."""
+        with self._lock:
+            stages = [(key, list(stage)) for key, stage in self._stages.items()]
+        return [
+            {
+                "stage": name,
+                "object_type": object_type,
+                "seconds": round(seconds, 6),
+                "records": records,
+                "records_out": records_out,
+                "records_per_second": round(records / seconds, 1) if records and seconds else None,
+            }
+            for (name, object_type), (seconds, records, records_out) in stages
+        ]
+
+    def log(self) -> None:
+        """Log the timings of every stage and emit them as metrics."""
+        for stage in self.report():
+            tags = {"stage": stage["stage"]}
+            if stage["object_type"]:
+                tags["object_type"] = stage["object_type"]
+            singer.metrics.log(logger, Point("timer", "stage_duration", stage["seconds"], tags))
+            if stage["records"]:
+                singer.metrics.log(logger, Point("counter", "stage_records_in", stage["records"], tags))
+            if stage["records_out"]:
+                singer.metrics.log(logger, Point("counter", "stage_records_out", stage["records_out"], tags))
+
+            name = f"{stage['stage']} {stage['object_type']}" if stage["object_type"] else stage["stage"]
+            throughput = (
+                f", {stage['records']} records, {stage['records_per_second']} records/s"
+                if stage["records_per_second"]
+                else ""
+            )
+            records_out = f", {stage['records_out']} out" if stage["records_out"] else ""
+            logger.info(f"Stage {name}: {stage['seconds']:.3f}s{throughput}{records_out}")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+
+class RequestRecord:
+    """Measurements of one request to Intacct, filled in as it is sent.
+
+    The serialize, network and parse phases add up over the attempts of a retried
+    request, as do the bytes sent and received.
+    """
+
+    def __init__(self, endpoint: str, control_id: Optional[str] = None, functions: int = 0):
+        self.endpoint = endpoint
+        self.control_id = control_id
+        self.functions = functions
+        self.phases: Dict[str, float] = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.attempts = 0
+        self.status = "success"
+        self.seconds = 0.0
+
+    def add_phase(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def summary(self) -> Dict:
+        return {
+            "endpoint": self.endpoint,
+            "control_id": self.control_id,
+            "functions": self.functions,
+            "status": self.status,
+            "seconds": round(self.seconds, 6),
+            "phases": {phase: round(seconds, 6) for phase, seconds in self.phases.items()},
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "attempts": self.attempts,
+        }
+
+
+class RequestMetrics:
+    """Counts, byte totals and latency histograms of the requests to each endpoint.
+
+    The time of every request phase is added to the stage timings under the endpoint,
+    and requests slower than slow_seconds are logged as they finish and kept, keyed by
+    control id, in the report.
+    """
+
+    def __init__(
+        self,
+        timings: StageTimings,
+        slow_seconds: float = DEFAULT_SLOW_REQUEST_SECONDS,
+        buckets=REQUEST_LATENCY_BUCKETS,
+    ):
+        self.timings = timings
+        self.slow_seconds = slow_seconds
+        self.buckets = tuple(buckets)
+        self._endpoints: Dict[str, Dict] = {}
+        self._slow: List[Dict] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def request(self, endpoint: str, control_id: Optional[str] = None, functions: int = 0):
+        """Measure the request sent in the body of the with statement."""
+        request = RequestRecord(endpoint, control_id, functions)
+        started_at = time.perf_counter()
+        try:
+            yield request
+        except Exception as exc:
+            request.status = type(exc).__name__
+            raise
+        finally:
+            request.seconds = time.perf_counter() - started_at
+            self.add(request)
+
+    def add(self, request: RequestRecord) -> None:
+        """Add a finished request."""
+        finished_at = time.perf_counter()
+        for phase, seconds in request.phases.items():
+            self.timings.add(phase, seconds, request.functions, object_type=request.endpoint)
+
+        with self._lock:
+            endpoint = self._endpoints.get(request.endpoint)
+            if endpoint is None:
+                endpoint = self._endpoints[request.endpoint] = {
+                    "requests": 0,
+                    "failures": 0,
+                    "functions": 0,
+                    "bytes_sent": 0,
+                    "bytes_received": 0,
+                    "seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "histogram": [0] * (len(self.buckets) + 1),
+                    "first_started_at": finished_at - request.seconds,
+                    "last_finished_at": finished_at,
+                }
+            endpoint["requests"] += 1
+            endpoint["failures"] += request.status != "success"
+            endpoint["functions"] += request.functions
+            endpoint["bytes_sent"] += request.bytes_sent
+            endpoint["bytes_received"] += request.bytes_received
+            endpoint["seconds"] += request.seconds
+            endpoint["max_seconds"] = max(endpoint["max_seconds"], request.seconds)
+            endpoint["histogram"][bisect.bisect_left(self.buckets, request.seconds)] += 1
+            endpoint["first_started_at"] = min(endpoint["first_started_at"], finished_at - request.seconds)
+            endpoint["last_finished_at"] = max(endpoint["last_finished_at"], finished_at)
+
+            slow = request.seconds >= self.slow_seconds
+            if slow:
+                self._slow.append(request.summary())
+                if len(self._slow) > SLOW_REQUESTS_KEPT:
+                    self._slow.sort(key=lambda summary: summary["seconds"], reverse=True)
+                    del self._slow[SLOW_REQUESTS_KEPT:]
+
+        if slow:
+            phases = ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in request.phases.items())
+            logger.warning(
+                f"Slow request {request.control_id} to {request.endpoint}: {request.seconds:.3f}s "
+                f"({phases}), {request.functions} functions, {request.bytes_sent} bytes sent, "
+                f"{request.bytes_received} bytes received, {request.attempts} attempts, {request.status}"
+            )
+
+    def _bucket_labels(self) -> List[str]:
+        return [f"<={bound:g}" for bound in self.buckets] + [f">{self.buckets[-1]:g}"]
+
+    def report(self) -> Dict:
+        """Return the totals and latency histogram of every endpoint and the slow requests."""
+        labels = self._bucket_labels()
+        with self._lock:
+            endpoints = {name: dict(endpoint) for name, endpoint in self._endpoints.items()}
+            slow = sorted(self._slow, key=lambda summary: summary["seconds"], reverse=True)
+
+        report = {}
+        for name, endpoint in endpoints.items():
+            span = endpoint["last_finished_at"] - endpoint["first_started_at"]
+            report[name] = {
+                "requests": endpoint["requests"],
+                "failures": endpoint["failures"],
+                "functions": endpoint["functions"],
+                "bytes_sent": endpoint["bytes_sent"],
+                "bytes_received": endpoint["bytes_received"],
+                "seconds": round(endpoint["seconds"], 6),
+                "mean_seconds": round(endpoint["seconds"] / endpoint["requests"], 6),
+                "max_seconds": round(endpoint["max_seconds"], 6),
+                "requests_per_second": round(endpoint["requests"] / span, 3) if span else None,
+                "latency_histogram": dict(zip(labels, endpoint["histogram"])),
+            }
+        return {
+            "endpoints": report,
+            "slow_requests": {
+                summary["control_id"]: {key: value for key, value in summary.items() if key != "control_id"}
+                for summary in slow
+            },
+        }
+
+    def log(self) -> None:
+        """Log the totals of every endpoint and emit them, with the histograms, as metrics."""
+        for name, endpoint in self.report()["endpoints"].items():
+            tags = {"endpoint": name}
+            for metric in ("requests", "failures", "functions", "bytes_sent", "bytes_received"):
+                singer.metrics.log(logger, Point("counter", f"http_{metric}", endpoint[metric], tags))
+            if endpoint["requests_per_second"] is not None:
+                singer.metrics.log(
+                    logger,
+                    Point("gauge", "http_requests_per_second", endpoint["requests_per_second"], tags),
+                )
+            for bucket, count in endpoint["latency_histogram"].items():
+                if not count:
+                    continue
+                singer.metrics.log(
+                    logger, Point("counter", "http_request_latency", count, {**tags, "bucket": bucket})
+                )
+
+            logger.info(
+                f"Requests to {name}: {endpoint['requests']} ({endpoint['failures']} failed), "
+                f"{endpoint['functions']} functions, {endpoint['bytes_sent']} bytes sent, "
+                f"{endpoint['bytes_received']} bytes received, mean {endpoint['mean_seconds']:.3f}s, "
+                f"max {endpoint['max_seconds']:.3f}s, {endpoint['requests_per_second']} requests/s"
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+            self._slow.clear()
+
+
+def write_metrics(path: str) -> None:
+    """Write the stage timings and request metrics of the run to a JSON file."""
+    with open(path, "w", encoding="utf-8") as metrics_file:
+        json.dump({"stages": timings.report(), "requests": request_metrics.report()}, metrics_file, indent=2)
+        metrics_file.write("\n")
+
+
+# Timings and request metrics of the current run
+timings = StageTimings()
+request_metrics = RequestMetrics(timings)
@@ -1,76 +1,166 @@
 import io
 import sys
 import json
-from typing import Dict, List
+from typing import Container, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
 
 import singer
 
+from .buffer import ColumnarBuffer
+from .const import JOURNAL_ENTRY_FIELD_NAMES
+from .reference import normalize_key
+from .state import StateCheckpoints
+
 logger = singer.get_logger()
 
 
-def get_input():
-    """Read the input from the pipeline and return a dictionary of the Records."""
-    input = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
-    input_value = []
+def iter_messages(lines: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+    """Yield every Singer message as it is read, as a dictionary.
 
-    # For each line of input, if it has data content (is a record) add the line to the dictionary
-    for row in input:
+    Reads stdin unless lines are given.
+    """
+    if lines is None:
+        lines = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+
+    for row in lines:
         try:
-            raw_input = singer.parse_message(row).asdict()         
+            yield singer.parse_message(row).asdict()
         except json.decoder.JSONDecodeError:
             logger.error("Unable to parse:\n{}".format(row))
             raise
-        type = raw_input["type"]
-
-        # Streams of type Record contain the inputted data
-        if type == "RECORD" and not any(
-            value == "" or value is None for value in raw_input["record"].values()
-        ):
-            # Group the data into dictionaries by stream name
-            stream_name = raw_input["stream"]
-            record = raw_input["record"] 
-            
-            # If a dictionary doesn't exist for the given stream name, create it
-            if not any(dict.get("stream") == stream_name for dict in input_value):
-                new_dict = {key: [value] for key, value in record.items()}
-                new_dict["stream"] = stream_name
-                input_value.append(new_dict)
-
-            # Else add the values of the record to the existing dictionary
-            else:
-                for key, value in record.items(): 
-                    existing_dict = [dict for dict in input_value if dict["stream"] == stream_name][0]
-                    existing_dict.setdefault(key, []).append(value)
-
-    return input_value
+
+
+def is_complete_record(message: Dict) -> bool:
+    """Streams of type Record contain the inputted data, records with empty values are skipped."""
+    return message["type"] == "RECORD" and not any(
+        value == "" or value is None for value in message["record"].values()
+    )
+
+
+def iter_records(lines: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, Dict]]:
+    """Yield the stream name and record of every complete RECORD message as it is read.
+
+    Reads stdin unless lines are given, so records can be consumed before the input ends.
+    """
+    for message in iter_messages(lines):
+        if is_complete_record(message):
+            yield message["stream"], message["record"]
+
+
+def get_input(lines: Optional[Iterable[str]] = None, states: Optional[StateCheckpoints] = None):
+    """Read the input from the pipeline and return a dictionary of the Records per stream.
+
+    Amount and date part columns the stream's SCHEMA declares as integer or number are
+    returned as numpy arrays, the other columns as lists of the records' values. STATE
+    messages are added to states, with the number of records of each stream read before them.
+    """
+    schemas = {}
+    # Column buffers of each stream, keyed by stream name in the order streams first appear
+    streams = {}
+    records = {}
+
+    for message in iter_messages(lines):
+        if message["type"] == "SCHEMA":
+            schemas[message["stream"]] = message["schema"]
+            continue
+        if message["type"] == "STATE":
+            if states is not None:
+                states.add(records, message["value"])
+            continue
+        if not is_complete_record(message):
+            continue
+
+        stream_name = message["stream"]
+        buffer = streams.get(stream_name)
+        if buffer is None:
+            buffer = streams[stream_name] = ColumnarBuffer(stream_name, schemas.get(stream_name))
+        buffer.append(message["record"])
+        records[stream_name] = records.get(stream_name, 0) + 1
+
+    return [buffer.to_dict() for buffer in streams.values()]
 
 
 def set_journal_entry_value(
     je_detail: dict,
-    intacct_values: List[Dict],
+    intacct_values: Container[str],
     field_name: str,
     search_value,
     object_name: str,
 ) -> bool:
-    """Creates journal entries for statistical and financial journals."""
-    if search_value and any(
-        filter(lambda o: o.get(field_name) == str(search_value), intacct_values)
-    ):
-        je_field_name = (
-            field_name
-            if field_name
-            in [
-                "EMPLOYEEID",
-                "CLASSID",
-                "CUSTOMERID",
-                "PROJECTID",
-                "ITEMID",
-                "VENDORID",
-            ]
-            else field_name.replace("ID", "")
-        )
+    """Creates journal entries for statistical and financial journals.
+
+    intacct_values is the set of known values for the field, usually taken from a ReferenceIndex.
+    """
+    if search_value and normalize_key(search_value) in intacct_values:
+        je_field_name = JOURNAL_ENTRY_FIELD_NAMES.get(field_name, field_name.replace("ID", ""))
         je_detail[je_field_name] = search_value
     else:
         raise Exception(
             f"Field {field_name} with the value {search_value} is missing in Intacct for {object_name}"
         )
+
+
+def find_unknown_values(values: Iterable, intacct_values: Container[str]) -> Dict[str, int]:
+    """Count the rows of every distinct value that is missing from intacct_values.
+
+    Empty values count as unknown.
+    """
+    row_counts = {}
+    for value, count in pd.Series(np.asarray(values, dtype=object)).value_counts(dropna=False).items():
+        key = normalize_key(value) if value else ""
+        row_counts[key] = row_counts.get(key, 0) + int(count)
+
+    unknown = frozenset(row_counts) - intacct_values
+    return {key: row_counts[key] for key in row_counts if key in unknown}
+
+
+def raise_unknown_values(unknown_values: Dict[str, Dict[str, int]], object_name: str) -> None:
+    """Raise a single error listing every unknown value of every field with its row count."""
+    unknown_values = {field: values for field, values in unknown_values.items() if values}
+    if not unknown_values:
+        return
+
+    details = "; ".join(
+        f"{field_name}: "
+        + ", ".join(
+            f"{value!r} ({count} row{'s' if count != 1 else ''})"
+            for value, count in sorted(values.items(), key=lambda item: -item[1])
+        )
+        for field_name, values in unknown_values.items()
+    )
+    raise Exception(f"Values missing in Intacct for {object_name}: {details}")
+
+
+def validate_columns(
+    data_frame, columns: Dict[str, Tuple[str, Container[str]]], object_name: str
+) -> None:
+    """Checks the distinct values of several columns before anything is built.
+
+    Parameters:
+        data_frame (DataFrame): Input data.
+        columns (dict): Intacct field name and known values, keyed by input column.
+            Columns missing from the input are ignored.
+        object_name (str): Name used in the error message.
+    """
+    unknown_values = {}
+    for column, (field_name, intacct_values) in columns.items():
+        if column in data_frame.columns:
+            found = find_unknown_values(data_frame[column].to_numpy(dtype=object), intacct_values)
+            field_unknown_values = unknown_values.setdefault(field_name, {})
+            for value, count in found.items():
+                field_unknown_values[value] = field_unknown_values.get(value, 0) + count
+    raise_unknown_values(unknown_values, object_name)
+
+
+def raise_failed_results(entries: List[Dict], results: List[Dict], object_name: str) -> None:
+    """Log every entry Intacct failed to create and raise if there was any."""
+    failed = 0
+    for entry, result in zip(entries, results):
+        if result["status"] == "failure":
+            failed += 1
+            logger.error(f"Failed to create {entry} in Intacct: {result['errormessage']}")
+
+    if failed:
+        raise Exception(f"{failed} of {len(entries)} {object_name} failed to upload to Intacct")
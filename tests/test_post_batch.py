@@ -0,0 +1,211 @@
+import re
+
+import pytest
+import requests
+
+from target_intacct.client import SageIntacctSDK
+from target_intacct.exceptions import WrongParamsError
+from target_intacct.ledger import PostingLedger
+
+LOGIN_RESPONSE = (
+    '<?xml version="1.0" encoding="UTF-8"?><response><control><status>success</status></control>'
+    "<operation><authentication><status>success</status></authentication><result><status>success</status>"
+    "<function>getAPISession</function><data><api><sessionid>session</sessionid>"
+    "<endpoint>https://api.intacct.test</endpoint></api></data></result></operation></response>"
+)
+
+ERRORS = {
+    "exists": "<errorno>BL34000061</errorno><description2>Rate already exists</description2>",
+    "invalid": "<errorno>BL01001973</errorno><description2>Invalid employee</description2>",
+    "empty description": "<errorno>BL01001973</errorno><description2></description2>",
+    "no description": "<errorno>BL01001973</errorno>",
+}
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.status_code = 200
+
+
+class Transport:
+    """Answers logins and creates, failing the functions of the employees in failures."""
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    def post(self, url, headers, data, timeout, stream=False):
+        body = data.decode("utf-8")
+        if "<login>" in body:
+            return Response(LOGIN_RESPONSE)
+        results = []
+        functions = re.findall(r'<function controlid="([^"]+)">.*?<employeeid>([^<]+)</employeeid>', body)
+        for control_id, employee_id in functions:
+            error = self.failures.get(employee_id)
+            if error:
+                results.append(
+                    f"<result><status>failure</status><function>create_employeerate</function>"
+                    f"<controlid>{control_id}</controlid><errormessage><error>{ERRORS[error]}</error>"
+                    f"</errormessage></result>"
+                )
+            else:
+                results.append(
+                    f"<result><status>success</status><function>create_employeerate</function>"
+                    f"<controlid>{control_id}</controlid><key>{employee_id}</key></result>"
+                )
+        return Response(
+            '<?xml version="1.0" encoding="UTF-8"?><response><control><status>success</status></control>'
+            "<operation><authentication><status>success</status></authentication>"
+            f"{''.join(results)}</operation></response>"
+        )
+
+
+class LostResponseTransport(Transport):
+    """Processes every unique request once, losing the response to the first one."""
+
+    def __init__(self, failures, processed):
+        super().__init__(failures)
+        self.processed = processed
+
+    def post(self, url, headers, data, timeout, stream=False):
+        body = data.decode("utf-8")
+        if "<login>" in body:
+            return super().post(url, headers, data, timeout, stream)
+        control_id = re.search(r"<controlid>([^<]+)</controlid>", body).group(1)
+        if control_id in self.processed:
+            return Response(
+                '<?xml version="1.0" encoding="UTF-8"?><response><control><status>failure</status></control>'
+                "<errormessage><error><errorno>XL03000009</errorno><description></description>"
+                "<description2>A request with this control id was already processed</description2>"
+                "</error></errormessage></response>"
+            )
+        self.processed.append(control_id)
+        response = super().post(url, headers, data, timeout, stream)
+        if len(self.processed) == 1:
+            raise requests.exceptions.ConnectionError("Connection reset by peer")
+        return response
+
+
+class RateLimiter:
+    def acquire(self):
+        pass
+
+    def on_response(self, seconds):
+        pass
+
+    def on_throttle(self):
+        pass
+
+
+def sdk(failures, ledger=None, transport=None):
+    return SageIntacctSDK(
+        api_url="https://api.intacct.test",
+        company_id="company",
+        sender_id="sender",
+        sender_password="password",
+        user_id="user",
+        user_password="password",
+        headers={},
+        entity_id="",
+        transport=transport or Transport(failures),
+        rate_limiter=RateLimiter(),
+        max_retries=0,
+        ledger=ledger,
+    )
+
+
+def post_employee_rates(employee_ids, failures, ledger=None, transport=None):
+    client = sdk(failures, ledger, transport)
+    functions = [
+        {"create_employeerate": {"employeeid": employee_id, "billingrate": "10"}}
+        for employee_id in employee_ids
+    ]
+    return client.post_batch(functions, endpoint="create_employeerate")
+
+
+@pytest.mark.parametrize("employee_ids", [["E1"], ["E0", "E1"]])
+@pytest.mark.parametrize("error,status", [("exists", "skipped"), ("invalid", "failure")])
+def test_post_batch_reports_failed_functions_per_row(employee_ids, error, status):
+    results = post_employee_rates(employee_ids, {"E1": error})
+
+    assert len(results) == len(employee_ids)
+    assert results[-1]["status"] == status
+    for result in results[:-1]:
+        assert result["status"] == "success"
+        assert result["RECORDNO"] == "E0"
+
+
+@pytest.mark.parametrize("error", ["empty description", "no description"])
+def test_post_batch_reports_failures_without_description(error, tmp_path):
+    ledger_path = tmp_path / "ledger.jsonl"
+
+    results = post_employee_rates(["E0", "E1", "E2"], {"E1": error}, PostingLedger(str(ledger_path)))
+
+    assert [result["status"] for result in results] == ["success", "failure", "success"]
+    assert results[1]["errormessage"]["error"]["errorno"] == "BL01001973"
+    assert len(PostingLedger(str(ledger_path))) == 2
+
+
+def test_check_function_result_raises_without_description():
+    client = sdk({})
+
+    with pytest.raises(WrongParamsError):
+        client._check_function_result(
+            {"status": "failure", "errormessage": {"error": [{"errorno": "Query Failed"}]}}
+        )
+
+
+def test_post_batch_splits_a_last_batch_of_one_row():
+    employee_ids = [f"E{number}" for number in range(51)]
+
+    results = post_employee_rates(employee_ids, {"E50": "exists", "E49": "invalid"})
+
+    assert [result["status"] for result in results[-3:]] == ["success", "failure", "skipped"]
+    assert results[0]["RECORDNO"] == "E0"
+
+
+def test_post_batch_resumes_from_the_ledger_and_clears_it_once_complete(tmp_path):
+    ledger_path = tmp_path / "ledger.jsonl"
+    employee_ids = [f"E{number}" for number in range(3)]
+
+    results = post_employee_rates(employee_ids, {"E2": "invalid"}, PostingLedger(str(ledger_path)))
+    assert [result["status"] for result in results] == ["success", "success", "failure"]
+    assert len(PostingLedger(str(ledger_path))) == 2
+
+    results = post_employee_rates(employee_ids, {}, PostingLedger(str(ledger_path)))
+    assert [result["status"] for result in results] == ["skipped", "skipped", "success"]
+    assert not ledger_path.exists()
+
+    results = post_employee_rates(employee_ids, {}, PostingLedger(str(ledger_path)))
+    assert [result["status"] for result in results] == ["success", "success", "success"]
+
+
+def test_post_batch_skips_requests_already_processed_in_the_resumed_run(tmp_path):
+    ledger_path = tmp_path / "ledger.jsonl"
+    processed = []
+    transport = LostResponseTransport({}, processed)
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        post_employee_rates(["E0", "E1"], {}, PostingLedger(str(ledger_path)), transport)
+    results = post_employee_rates(["E0", "E1"], {}, PostingLedger(str(ledger_path)), transport)
+    assert [result["status"] for result in results] == ["skipped", "skipped"]
+    assert len(processed) == 1
+
+    results = post_employee_rates(["E0", "E1"], {}, PostingLedger(str(ledger_path)), transport)
+    assert [result["status"] for result in results] == ["success", "success"]
+    assert len(processed) == 2
+
+
+@pytest.mark.parametrize("failures,counts", [({}, [3]), ({"E1": "invalid"}, [1]), ({"E0": "invalid"}, [])])
+def test_post_batch_reports_the_leading_functions_posted(failures, counts):
+    client = sdk(failures)
+    reported = []
+
+    client.post_batch(
+        [{"create_employeerate": {"employeeid": f"E{number}"}} for number in range(3)],
+        endpoint="create_employeerate",
+        on_posted=reported.append,
+    )
+
+    assert reported == counts
@@ -0,0 +1,72 @@
+import requests
+
+from target_intacct.dry_run import DryRunSDK
+
+
+def dry_run_client(**kwargs):
+    return DryRunSDK(
+        reference_snapshot={},
+        api_url="https://api.intacct.test",
+        company_id="company",
+        sender_id="sender",
+        sender_password="",
+        user_id="user",
+        user_password="",
+        headers={},
+        entity_id="",
+        **kwargs,
+    )
+
+
+def journal(lines):
+    return {
+        "JOURNAL": "STJ",
+        "BATCH_DATE": "01/31/2024",
+        "BATCH_TITLE": "title",
+        "ENTRIES": {"GLENTRY": [{"AMOUNT": "1", "TR_TYPE": "1", "STATACCOUNTNO": "9000"}] * lines},
+    }
+
+
+def test_post_journals_rolls_back_after_a_connection_error(monkeypatch):
+    client = dry_run_client(journal_max_lines=2, journal_rollback=True, post_workers=1)
+    post_journal = client.post_journal
+    deleted = []
+
+    def fail_second_batch(batch):
+        if batch["BATCH_TITLE"] == "title (2/3)":
+            raise requests.exceptions.ConnectionError("Connection reset")
+        return post_journal(batch)
+
+    monkeypatch.setattr(client, "post_journal", fail_second_batch)
+    monkeypatch.setattr(client, "delete_journal", deleted.append)
+
+    results = client.post_journals([journal(6)])
+
+    assert [result["status"] for result in results] == ["rolled back", "failure", "skipped"]
+    assert "ConnectionError" in results[1]["errormessage"]
+    assert deleted == [results[0]["RECORDNO"]]
+
+
+def test_post_journals_keeps_rolling_back_after_a_connection_error(monkeypatch):
+    client = dry_run_client(journal_max_lines=2, journal_rollback=True, post_workers=1)
+    post_journal = client.post_journal
+    deleted = []
+
+    def fail_last_batch(batch):
+        if batch["BATCH_TITLE"] == "title (3/3)":
+            raise requests.exceptions.ConnectionError("Connection reset")
+        return post_journal(batch)
+
+    def fail_first_delete(recordno):
+        if not deleted:
+            deleted.append(None)
+            raise requests.exceptions.ReadTimeout("Read timed out")
+        deleted.append(recordno)
+
+    monkeypatch.setattr(client, "post_journal", fail_last_batch)
+    monkeypatch.setattr(client, "delete_journal", fail_first_delete)
+
+    results = client.post_journals([journal(6)])
+
+    assert [result["status"] for result in results] == ["success", "rolled back", "failure"]
+    assert deleted == [None, results[1]["RECORDNO"]]
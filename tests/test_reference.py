@@ -0,0 +1,32 @@
+from target_intacct.reference import load_reference_index_for_values
+
+
+class Client:
+    """Serves departments from the reference cache and looks up locations by value."""
+
+    reference_cache = object()
+
+    def __init__(self):
+        self.refreshed = []
+
+    def get_existing_values(self, object_values, cached=None):
+        cached.add("departments")
+        return {"departments": {"D1"}, "locations": {"L1"}}
+
+    def get_entities(self, object_fields, refresh=False):
+        self.refreshed.extend(object_fields)
+        return {object_type: [{fields[0]: "NEW"}] for object_type, fields in object_fields.items()}
+
+
+def test_only_cached_object_types_are_refreshed_for_unknown_values():
+    client = Client()
+    reference_index = load_reference_index_for_values(
+        client,
+        {"departments": ("DEPARTMENTID", ["D1", "NEW"]), "locations": ("LOCATIONID", ["L1", "NEW"])},
+    )
+
+    assert "NEW" not in reference_index.values("locations", "LOCATIONID")
+    assert client.refreshed == []
+
+    assert "NEW" in reference_index.values("departments", "DEPARTMENTID")
+    assert client.refreshed == ["departments"]
@@ -0,0 +1,140 @@
+import pandas as pd
+import pytest
+import xmltodict
+
+from target_intacct.dry_run import DryRunSDK
+from target_intacct.employee_rate import build_employee_rates
+from target_intacct.payment_record import build_payment_functions
+from target_intacct.request_xml import to_xml
+from target_intacct.statistical_journal import build_lines
+
+PAYMENT_CONFIG = {
+    "accountno_1": 1000,
+    "accountno_2": 1001,
+    "accountno_3": 1002,
+    "bankaccountid": "BANK",
+    "checkno": "1",
+    "classid": "C1",
+    "customerid": "CUST",
+    "departmentid": "D1",
+    "description": "Payouts <store> & fees",
+    "item1099": "false",
+    "locationid": "L1",
+    "manual_payment_memo": "Negative payout",
+    "memo": "Payout",
+    "paymentmethod": "EFT",
+    "projectid": "P1",
+    "source": "Store",
+    "vendorid": "V1",
+}
+
+
+class RecordingSDK(DryRunSDK):
+    """Dry run client keeping the dict body of every request it serializes."""
+
+    def __init__(self, **kwargs):
+        self.bodies = []
+        super().__init__(**kwargs)
+
+    def _post_request(self, dict_body, api_url, request, page_parser=None, function_results=False):
+        self.bodies.append(dict_body)
+        return super()._post_request(dict_body, api_url, request, page_parser, function_results)
+
+
+def request_bodies():
+    client = RecordingSDK(
+        reference_snapshot={},
+        api_url="https://api.intacct.test",
+        company_id="company",
+        sender_id="sender",
+        sender_password="sender & password",
+        user_id="user",
+        user_password="<password>",
+        headers={},
+        entity_id="",
+    )
+    bodies = {"login": client.bodies[-1]}
+
+    statistical = pd.DataFrame(
+        {
+            "tr_type": ["1", "-1"],
+            "accountno": ["9000", "9001"],
+            "amount": [2.675, 3],
+            "departmentid": ["D1", "D&2"],
+        }
+    )
+    journal = build_lines(
+        statistical,
+        {"departmentid": frozenset({"D1", "D&2"})},
+        frozenset({"9000", "9001"}),
+        "statistical_journal",
+        "Title <1>",
+    )[0]
+    client.post_journal(journal)
+    bodies["GLBATCH"] = client.bodies[-1]
+
+    employee_rates = build_employee_rates(
+        pd.DataFrame(
+            {
+                "employeeid": ["E1", "E2"],
+                "ratestartdate": ["2024-01-31", "2024-02-01"],
+                "billingrate": ["10", None],
+                "salaryrate": ["20", "30"],
+            }
+        )
+    )
+    client.post_employee_rate(employee_rates[0])
+    bodies["create_employeerate"] = client.bodies[-1]
+    client.post_batch(
+        [{"create_employeerate": employee_rate} for employee_rate in employee_rates],
+        endpoint="create_employeerate",
+    )
+    bodies["create_employeerate batch"] = client.bodies[-1]
+
+    payments = pd.DataFrame(
+        {
+            "payout_id": [1, 2],
+            "payout_amount": [150.5, -20.25],
+            "gross_amount": [160.0, 0.0],
+            "total_fees": [7.5, 0.0],
+            "total_sales_tax": [2.0, 0.0],
+            "year": [2024, 2024],
+            "month": [1, 2],
+            "day": [31, 1],
+        }
+    )
+    functions = build_payment_functions(payments, PAYMENT_CONFIG)
+    client.post_batch(functions[:1], endpoint="payment_record")
+    bodies["record_otherreceipt"] = client.bodies[-1]
+    client.post_batch(functions[1:], endpoint="payment_record")
+    bodies["create_appayment"] = client.bodies[-1]
+
+    client.send_functions(
+        [
+            client._count_query("EMPLOYEE"),
+            client._entity_page_query("EMPLOYEE", ["EMPLOYEEID", "NAME"], 1000, 0),
+        ],
+        endpoint="reference_data",
+    )
+    bodies["query"] = client.bodies[-1]
+    return bodies
+
+
+BODIES = request_bodies()
+
+
+@pytest.mark.parametrize("name", list(BODIES))
+def test_to_xml_matches_xmltodict(name):
+    assert to_xml(BODIES[name]) == xmltodict.unparse(BODIES[name])
+
+
+def test_to_xml_keeps_dict_order():
+    document = {"create_employeerate": {"salaryrate": "20", "employeeid": "E1", "billingrate": None}}
+
+    assert to_xml(document) == xmltodict.unparse(document)
+
+
+def test_to_xml_fragment_matches_xmltodict():
+    function = {"function": {"@controlid": "a&b", "create": {"GLBATCH": {"ENTRIES": {"GLENTRY": [{"A": 1}, {"A": True}]}}}}}
+
+    assert to_xml(function, full_document=False) == xmltodict.unparse(function, full_document=False)
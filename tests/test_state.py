@@ -0,0 +1,42 @@
+import json
+
+from target_intacct.state import StateCheckpoints
+from target_intacct.utils import get_input
+
+
+def messages(*bookmarks):
+    """A STATE before and after every record, with the number of records read as bookmark."""
+    lines = [json.dumps({"type": "SCHEMA", "stream": "rates", "schema": {"properties": {}}, "key_properties": []})]
+    for bookmark in bookmarks:
+        lines.append(json.dumps({"type": "STATE", "value": {"bookmark": bookmark}}))
+        lines.append(json.dumps({"type": "RECORD", "stream": "rates", "record": {"employeeid": f"E{bookmark}"}}))
+    lines.append(json.dumps({"type": "STATE", "value": {"bookmark": len(bookmarks)}}))
+    return lines
+
+
+def written_states(capsys):
+    return [json.loads(line)["value"] for line in capsys.readouterr().out.splitlines()]
+
+
+def test_states_are_written_once_the_records_before_them_are_posted(capsys):
+    checkpoints = StateCheckpoints()
+    get_input(messages(0, 1, 2), states=checkpoints)
+    assert written_states(capsys) == []
+
+    checkpoints.posted("rates", 2)
+    assert written_states(capsys) == [{"bookmark": 2, "target_intacct": {"records_posted": {"rates": 2}}}]
+
+    checkpoints.posted("rates", 2)
+    assert written_states(capsys) == []
+
+    checkpoints.posted("rates")
+    assert written_states(capsys) == [{"bookmark": 3, "target_intacct": {"records_posted": {"rates": 3}}}]
+
+
+def test_states_are_not_written_by_dry_runs(capsys):
+    checkpoints = StateCheckpoints(emit=False)
+    get_input(messages(0), states=checkpoints)
+
+    checkpoints.posted()
+
+    assert written_states(capsys) == []
@@ -0,0 +1,82 @@
+import io
+import json
+import sys
+
+import pandas as pd
+
+from target_intacct.dry_run import DryRunSDK
+from target_intacct.statistical_journal import build_lines, statistical_journal_upload
+from target_intacct.utils import get_input
+
+
+def test_build_lines_rounds_amounts_like_python():
+    data = pd.DataFrame(
+        {
+            "tr_type": ["1", "-1", "1"],
+            "accountno_1": ["9000", "9000", "9000"],
+            "amount_1": [2.675, 1.005, 0.125],
+            "accountno_2": ["9001", "9001", "9001"],
+            "amount_2": [5, 7, 2],
+        }
+    )
+
+    journal_entries = build_lines(data, {}, frozenset({"9000", "9001"}), "statistical_journal", "title")
+
+    amounts = [line["AMOUNT"] for line in journal_entries[0]["ENTRIES"]["GLENTRY"]]
+    assert amounts == ["2.67", "1.0", "0.12", "5", "7", "2"]
+
+
+def test_upload_orders_dimensions_like_statistical_journal_dimensions(monkeypatch):
+    # Dimension columns arrive in the reverse of their STATISTICAL_JOURNAL_DIMENSIONS order
+    schema = {"type": "SCHEMA", "stream": "journal", "schema": {"properties": {}}, "key_properties": []}
+    record = {"departmentid": "D1", "tr_type": "1", "locationid": "L1", "accountno": "9000", "amount": 1.5}
+    lines = [json.dumps(schema), json.dumps({"type": "RECORD", "stream": "journal", "record": record})]
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(("\n".join(lines) + "\n").encode("utf-8"))))
+    output = io.BytesIO()
+    client = DryRunSDK(
+        reference_snapshot={
+            "locations": [{"LOCATIONID": "L1"}],
+            "departments": [{"DEPARTMENTID": "D1"}],
+            "statistical_accounts": [{"ACCOUNTNO": "9000"}],
+        },
+        output=output,
+        api_url="https://api.intacct.test",
+        company_id="company",
+        sender_id="sender",
+        sender_password="",
+        user_id="user",
+        user_password="",
+        headers={},
+        entity_id="",
+    )
+
+    statistical_journal_upload(client, "statistical_journal", "title")
+
+    body = output.getvalue().decode("utf-8")
+    assert body.index("<LOCATION>L1</LOCATION>") < body.index("<DEPARTMENT>D1</DEPARTMENT>")
+
+
+def test_get_input_keeps_number_typed_ids():
+    properties = {
+        "tr_type": {"type": ["null", "integer"]},
+        "accountno": {"type": ["null", "number"]},
+        "amount": {"type": ["null", "number"]},
+        "locationid": {"type": ["null", "number"]},
+    }
+    schema = {"type": "SCHEMA", "stream": "journal", "schema": {"properties": properties}, "key_properties": []}
+    record = {"tr_type": 1, "accountno": 9000, "amount": 2.5, "locationid": 100}
+    lines = [json.dumps(schema), json.dumps({"type": "RECORD", "stream": "journal", "record": record})]
+
+    columns = get_input(lines)[0]
+    assert columns["accountno"] == [9000]
+    assert columns["locationid"] == [100]
+
+    data = pd.DataFrame(columns)
+    journal_entries = build_lines(
+        data, {"locationid": frozenset({"100"})}, frozenset({"9000"}), "statistical_journal", "title"
+    )
+
+    line = journal_entries[0]["ENTRIES"]["GLENTRY"][0]
+    assert line["ACCOUNTNO"] == "9000"
+    assert line["LOCATION"] == "100"
+    assert line["AMOUNT"] == "2.5"